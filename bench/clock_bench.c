@@ -0,0 +1,56 @@
+#define _GNU_SOURCE
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#define HAVE_TSC 1
+#endif
+
+// Cost of the per-event primitives the tracer can use.
+// Usage:
+//   ./clock_bench [iterations]
+// Prints one JSON object: ns per call for each clock source and tid lookup.
+
+static __thread pid_t cached_tid = 0;
+static volatile long long sink;
+
+static long long now_ns(void) {
+    struct timespec ts; clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec;
+}
+
+static long long read_clock(clockid_t id) {
+    struct timespec ts; clock_gettime(id, &ts);
+    return (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec;
+}
+
+static pid_t tid_cached(void) {
+    if (!cached_tid) cached_tid = (pid_t)syscall(SYS_gettid);
+    return cached_tid;
+}
+
+#define MEASURE(label, expr, first)                                       \
+    do {                                                                  \
+        long long t0 = now_ns();                                          \
+        for (long i = 0; i < iters; i++) sink += (long long)(expr);       \
+        double ns = (double)(now_ns() - t0) / (double)iters;              \
+        printf("%s\"%s\": %.2f", (first) ? "" : ", ", label, ns);         \
+    } while (0)
+
+int main(int argc, char **argv) {
+    long iters = argc > 1 ? atol(argv[1]) : 2000000;
+    printf("{\"iterations\": %ld, \"ns_per_call\": {", iters);
+    MEASURE("realtime", read_clock(CLOCK_REALTIME), 1);
+    MEASURE("monotonic", read_clock(CLOCK_MONOTONIC), 0);
+    MEASURE("monotonic-coarse", read_clock(CLOCK_MONOTONIC_COARSE), 0);
+#ifdef HAVE_TSC
+    MEASURE("tsc", __rdtsc(), 0);
+#endif
+    MEASURE("gettid_syscall", syscall(SYS_gettid), 0);
+    MEASURE("gettid_cached", tid_cached(), 0);
+    printf("}}\n");
+    return 0;
+}
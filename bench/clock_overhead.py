@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+clock_overhead.py — per-event tracer overhead for each MFTRACE_CLOCK source
+
+Runs bench/clock_bench (raw cost of each clock read and tid lookup), then
+times bench/stress_threads with no tracer and under libmftrace.so with every
+clock source. Overhead is reported as extra ns per traced malloc/free event.
+
+Usage:
+  python3 bench/clock_overhead.py [--threads 1] [--iters 200000] [--repeat 3] [--out results/bench]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CLOCKS = ("realtime", "monotonic", "monotonic-coarse", "tsc")
+
+
+def timed_run(cmd, env, repeat):
+    """Best-of-`repeat` wall time in seconds."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-event tracer overhead per clock source.")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--iters", type=int, default=200000, help="malloc/free pairs per thread")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=os.path.join(ROOT, "results", "bench"))
+    args = parser.parse_args()
+
+    clock_bench = os.path.join(ROOT, "bench", "clock_bench")
+    stress = os.path.join(ROOT, "bench", "stress_threads")
+    tracer = os.path.join(ROOT, "tracer", "libmftrace.so")
+    for path in (clock_bench, stress, tracer):
+        if not os.path.exists(path):
+            print(f"[!] {path} missing; run `make tracer bench` first")
+            sys.exit(1)
+    os.makedirs(args.out, exist_ok=True)
+
+    primitives = json.loads(subprocess.run([clock_bench], capture_output=True, text=True,
+                                           check=True).stdout)
+    print("[+] Primitive cost (ns/call):")
+    for name, ns in primitives["ns_per_call"].items():
+        print(f"    {name:18s} {ns:8.2f}")
+
+    events = 2 * args.threads * args.iters
+    cmd = [stress, str(args.threads), str(args.iters)]
+    baseline = timed_run(cmd, os.environ.copy(), args.repeat)
+    results = {"primitives": primitives["ns_per_call"], "events": events,
+               "baseline_s": baseline, "clocks": {}}
+
+    print(f"[+] Per-event overhead ({events} events, best of {args.repeat}):")
+    with tempfile.TemporaryDirectory() as tmp:
+        for clock in CLOCKS:
+            env = os.environ.copy()
+            env.update(LD_PRELOAD=tracer, MFTRACE_CLOCK=clock,
+                       MFTRACE_LOG=os.path.join(tmp, f"{clock}.csv"))
+            traced = timed_run(cmd, env, args.repeat)
+            ns = (traced - baseline) * 1e9 / events
+            results["clocks"][clock] = {"traced_s": traced, "overhead_ns_per_event": ns}
+            print(f"    {clock:18s} {ns:8.1f} ns/event")
+
+    out_json = os.path.join(args.out, "clock_overhead.json")
+    with open(out_json, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"[✓] Results saved to {out_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+stress_missed.py — count events the tracer loses under concurrent allocation
+
+Runs bench/stress_threads under libmftrace.so for each thread count, then
+compares the ALLOC/FREE events recorded for the worker threads against the
+number of malloc/free calls they made.
+
+Usage:
+  python3 bench/stress_missed.py [--threads 1,2,4,8,16] [--iters 20000] [--format csv|mfz] [--out results/stress]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from memfragx.trace_io import iter_records
+
+
+def count_worker_events(trace_path, tids, sizes):
+    tids, sizes = set(tids), set(sizes)
+    allocs = frees = 0
+    for rec in iter_records(trace_path):
+        if rec["tid"] not in tids:
+            continue
+        if rec["event"] == "ALLOC" and rec["size"] in sizes:
+            allocs += 1
+        elif rec["event"] == "FREE":
+            frees += 1
+    return allocs, frees
+
+
+def run_stress(binary, tracer, threads, iters, trace_path):
+    env = os.environ.copy()
+    env["LD_PRELOAD"] = tracer
+    env["MFTRACE_LOG"] = trace_path
+    proc = subprocess.run([binary, str(threads), str(iters)], env=env,
+                          capture_output=True, text=True, check=True)
+    expected = json.loads(proc.stdout.strip().splitlines()[-1])
+    allocs, frees = count_worker_events(trace_path, expected["tids"], expected["sizes"])
+    return {
+        "threads": threads,
+        "iters": iters,
+        "expected_events": expected["expected_allocs"] + expected["expected_frees"],
+        "recorded_events": allocs + frees,
+        "missed_allocs": max(0, expected["expected_allocs"] - allocs),
+        "missed_frees": max(0, expected["expected_frees"] - frees),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count tracer events lost under N threads.")
+    parser.add_argument("--threads", default="1,2,4,8,16", help="Comma-separated thread counts")
+    parser.add_argument("--iters", type=int, default=20000, help="malloc/free pairs per thread")
+    parser.add_argument("--format", choices=["csv", "mfz"], default="csv")
+    parser.add_argument("--out", default=os.path.join(ROOT, "results", "stress"))
+    args = parser.parse_args()
+
+    binary = os.path.join(ROOT, "bench", "stress_threads")
+    tracer = os.path.join(ROOT, "tracer", "libmftrace.so")
+    for path in (binary, tracer):
+        if not os.path.exists(path):
+            print(f"[!] {path} missing; run `make tracer bench` first")
+            sys.exit(1)
+    os.makedirs(args.out, exist_ok=True)
+
+    results = []
+    for n in (int(t) for t in args.threads.split(",")):
+        trace = os.path.join(args.out, f"stress_{n}t.{args.format}")
+        r = run_stress(binary, tracer, n, args.iters, trace)
+        missed = r["missed_allocs"] + r["missed_frees"]
+        print(f"[+] {n:3d} threads: {r['recorded_events']}/{r['expected_events']} events, missed {missed}")
+        results.append(r)
+
+    out_json = os.path.join(args.out, "stress_missed.json")
+    with open(out_json, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"[✓] Results saved to {out_json}")
+    if any(r["missed_allocs"] or r["missed_frees"] for r in results):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#define _GNU_SOURCE
+#include <stdio.h>
+#include <stdlib.h>
+#include <pthread.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+
+// Multi-threaded malloc/free stress for the tracer.
+// Usage:
+//   ./stress_threads <threads> <iters_per_thread>
+// Every worker performs <iters> malloc+free pairs with sizes from STRESS_SIZES.
+// Prints one JSON line with the worker tids and the expected event counts so
+// bench/stress_missed.py can count how many events the tracer lost.
+
+static const size_t STRESS_SIZES[] = { 24, 40, 72, 136 };
+#define NSIZES (sizeof(STRESS_SIZES) / sizeof(STRESS_SIZES[0]))
+
+struct worker { pthread_t th; long iters; pid_t tid; };
+static pthread_barrier_t start_line;
+static void *volatile sink;
+
+static void *run_worker(void *arg) {
+    struct worker *w = arg;
+    w->tid = (pid_t)syscall(SYS_gettid);
+    pthread_barrier_wait(&start_line);       // maximise contention in the hooks
+    for (long i = 0; i < w->iters; i++) {
+        void *p = malloc(STRESS_SIZES[i % NSIZES]);
+        sink = p;
+        free(p);
+    }
+    return NULL;
+}
+
+int main(int argc, char **argv) {
+    if (argc < 3) {
+        fprintf(stderr, "usage: %s <threads> <iters_per_thread>\n", argv[0]);
+        return 1;
+    }
+    int nthreads = atoi(argv[1]);
+    long iters = atol(argv[2]);
+    if (nthreads < 1) nthreads = 1;
+
+    struct worker *ws = calloc(nthreads, sizeof(*ws));
+    if (!ws) { perror("calloc"); return 1; }
+    pthread_barrier_init(&start_line, NULL, nthreads);
+    for (int t = 0; t < nthreads; t++) {
+        ws[t].iters = iters;
+        if (pthread_create(&ws[t].th, NULL, run_worker, &ws[t]) != 0) { perror("pthread_create"); return 1; }
+    }
+    for (int t = 0; t < nthreads; t++) pthread_join(ws[t].th, NULL);
+
+    printf("{\"threads\": %d, \"iters\": %ld, \"expected_allocs\": %ld, \"expected_frees\": %ld, \"sizes\": [",
+           nthreads, iters, nthreads * iters, nthreads * iters);
+    for (size_t i = 0; i < NSIZES; i++) printf("%s%zu", i ? ", " : "", STRESS_SIZES[i]);
+    printf("], \"tids\": [");
+    for (int t = 0; t < nthreads; t++) printf("%s%d", t ? ", " : "", ws[t].tid);
+    printf("]}\n");
+    fflush(stdout);
+
+    pthread_barrier_destroy(&start_line);
+    free(ws);
+    return 0;
+}
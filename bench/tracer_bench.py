@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+tracer_bench.py — what libmftrace.so costs, per workload and tracer mode
+
+Runs the workload/workload patterns (uniform, burst, pareto) single-threaded
+and a multi-threaded workload (bimodal lifetimes, cross-thread frees) at
+several thread counts, once without the tracer and once per tracer mode
+(CSV / mfz, clock source). For every run it
+reports:
+
+  * overhead_ns_per_event  extra wall time per traced malloc/free event
+  * throughput_eps         events per second (baseline and traced), and for the
+                           threaded runs the scaling relative to 1 thread
+  * trace_bytes_per_event  trace file size / recorded events
+  * rss_overhead_kb        max RSS traced minus max RSS baseline
+
+Results are written as JSON and checked against bench/thresholds.json (absolute
+limits) and, with --previous, against an earlier results file (relative
+slowdown). Any violation exits with status 2.
+
+Usage:
+  python3 bench/tracer_bench.py [--ops 200000] [--threads 1,2,4,8] [--iters 100000]
+                                [--modes csv,mfz,csv-tsc] [--repeat 3]
+                                [--previous results/bench/tracer_bench.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from memfragx.trace_io import is_block_trace, read_index
+
+PATTERNS = ("uniform", "burst", "pareto")
+# producer/consumer-style variant used for the thread-scaling runs
+THREADED_ARGS = ["--cross-free", "0.25", "--lifetime", "bimodal:64:20000:0.1"]
+
+# tracer mode -> (trace extension, extra environment)
+MODES = {
+    "csv": ("csv", {}),
+    "csv-monotonic": ("csv", {"MFTRACE_CLOCK": "monotonic"}),
+    "csv-tsc": ("csv", {"MFTRACE_CLOCK": "tsc"}),
+    "mfz": ("mfz", {}),
+    "mfz-raw": ("mfz", {"MFTRACE_CODEC": "raw"}),
+}
+
+
+def run_measured(cmd, env):
+    """Run once; returns (wall seconds, max RSS in KB)."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return elapsed, usage.ru_maxrss
+
+
+def best_of(cmd, env, repeat):
+    """(wall, max RSS) of the fastest run; both figures come from that same run."""
+    return min((run_measured(cmd, env) for _ in range(repeat)), key=lambda r: r[0])
+
+
+def build_workload(tmp):
+    """Compile workload/workload.c next to the temp traces (the checked-in binary may be stale)."""
+    src = os.path.join(ROOT, "workload", "workload.c")
+    binary = os.path.join(tmp, "workload")
+    subprocess.run(["gcc", "-O2", src, "-o", binary, "-pthread", "-lm"], check=True)
+    return binary
+
+
+def count_events(trace_path):
+    """Events recorded in a trace, without parsing rows."""
+    if is_block_trace(trace_path):
+        return sum(b.n_events for b in read_index(trace_path)[1])
+    n = 0
+    with open(trace_path, "rb") as f:
+        for line in f:
+            if not line.startswith(b"#"):
+                n += 1
+    return max(0, n - 1)  # column header
+
+
+def bench_case(cmd, modes, tracer, repeat, tmp):
+    """Baseline plus one traced run per mode for a single command."""
+    base_s, base_rss = best_of(cmd, os.environ.copy(), repeat)
+    case = {"cmd": " ".join(os.path.basename(c) if i == 0 else c for i, c in enumerate(cmd)),
+            "baseline_s": base_s, "baseline_rss_kb": base_rss, "modes": {}}
+    for mode in modes:
+        ext, extra = MODES[mode]
+        trace = os.path.join(tmp, f"bench.{ext}")
+        env = os.environ.copy()
+        env.update(extra, LD_PRELOAD=tracer, MFTRACE_LOG=trace)
+        traced_s, traced_rss = best_of(cmd, env, repeat)
+        events = count_events(trace)
+        case["modes"][mode] = {
+            "events": events,
+            "traced_s": traced_s,
+            "overhead_ns_per_event": (traced_s - base_s) * 1e9 / max(events, 1),
+            "baseline_throughput_eps": events / base_s,
+            "traced_throughput_eps": events / traced_s,
+            "trace_bytes_per_event": os.path.getsize(trace) / max(events, 1),
+            "rss_overhead_kb": traced_rss - base_rss,
+        }
+        os.remove(trace)
+    return case
+
+
+def add_scaling(threaded):
+    """Traced and baseline throughput at N threads relative to 1 thread."""
+    one = threaded.get("1")
+    if not one:
+        return
+    for case in threaded.values():
+        for mode, r in case["modes"].items():
+            ref = one["modes"][mode]
+            r["baseline_scaling"] = r["baseline_throughput_eps"] / ref["baseline_throughput_eps"]
+            r["traced_scaling"] = r["traced_throughput_eps"] / ref["traced_throughput_eps"]
+
+
+def limit_for(table, mode):
+    """A threshold keyed by tracer mode (e.g. mfz-raw), else by its trace format (csv/mfz)."""
+    if not isinstance(table, dict):
+        return table
+    return table.get(mode, table.get(MODES[mode][0]))
+
+
+def check_thresholds(results, thresholds, previous=None):
+    """List of human-readable violations."""
+    problems = []
+    for group in ("patterns", "threads"):
+        for name, case in results[group].items():
+            for mode, r in case["modes"].items():
+                label = f"{group}/{name}/{mode}"
+                limit = limit_for(thresholds["max_overhead_ns_per_event"], mode)
+                if limit is not None and r["overhead_ns_per_event"] > limit:
+                    problems.append(f"{label}: {r['overhead_ns_per_event']:.0f} ns/event > {limit}")
+                limit = limit_for(thresholds["max_trace_bytes_per_event"], mode)
+                if limit is not None and r["trace_bytes_per_event"] > limit:
+                    problems.append(f"{label}: {r['trace_bytes_per_event']:.1f} bytes/event > {limit}")
+                if r["rss_overhead_kb"] > thresholds["max_rss_overhead_kb"]:
+                    problems.append(f"{label}: RSS +{r['rss_overhead_kb']} KB > "
+                                    f"{thresholds['max_rss_overhead_kb']}")
+                old = (previous or {}).get(group, {}).get(name, {}).get("modes", {}).get(mode)
+                if old and old["overhead_ns_per_event"] > 0:
+                    ratio = r["overhead_ns_per_event"] / old["overhead_ns_per_event"] - 1
+                    if ratio > thresholds["max_relative_regression"]:
+                        problems.append(f"{label}: overhead {ratio:+.0%} vs previous run")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark libmftrace.so overhead across workloads and modes.")
+    parser.add_argument("--ops", type=int, default=200000, help="workload operations per pattern")
+    parser.add_argument("--max-size", type=int, default=4096, help="workload max allocation size")
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated thread counts")
+    parser.add_argument("--iters", type=int, default=100000, help="workload operations per thread")
+    parser.add_argument("--modes", default="csv,mfz", help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--thresholds", default=os.path.join(ROOT, "bench", "thresholds.json"))
+    parser.add_argument("--previous", help="earlier tracer_bench.json to check for relative regressions")
+    parser.add_argument("--out", default=os.path.join(ROOT, "results", "bench"))
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    for mode in modes:
+        if mode not in MODES:
+            print(f"[!] Unknown mode {mode!r}; choose from {', '.join(MODES)}")
+            sys.exit(1)
+    tracer = os.path.join(ROOT, "tracer", "libmftrace.so")
+    if not os.path.exists(tracer):
+        print(f"[!] {tracer} missing; run `make tracer` first")
+        sys.exit(1)
+    os.makedirs(args.out, exist_ok=True)
+
+    results = {"modes": modes, "repeat": args.repeat, "patterns": {}, "threads": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = build_workload(tmp)
+        for pattern in PATTERNS:
+            cmd = [workload, pattern, str(args.ops), str(args.max_size)]
+            case = bench_case(cmd, modes, tracer, args.repeat, tmp)
+            results["patterns"][pattern] = case
+            for mode, r in case["modes"].items():
+                print(f"[+] {pattern:8s} {mode:14s} {r['overhead_ns_per_event']:8.1f} ns/event  "
+                      f"{r['trace_bytes_per_event']:6.1f} B/event  RSS +{r['rss_overhead_kb']} KB")
+
+        for n in (int(t) for t in args.threads.split(",")):
+            cmd = [workload, "uniform", str(n * args.iters), str(args.max_size),
+                   "--threads", str(n)] + THREADED_ARGS
+            results["threads"][str(n)] = bench_case(cmd, modes, tracer, args.repeat, tmp)
+        add_scaling(results["threads"])
+        for n, case in results["threads"].items():
+            for mode, r in case["modes"].items():
+                print(f"[+] {n:>3s} threads {mode:14s} {r['overhead_ns_per_event']:8.1f} ns/event  "
+                      f"{r['traced_throughput_eps'] / 1e6:6.2f} M events/s traced  "
+                      f"scaling x{r.get('traced_scaling', 1.0):.2f} "
+                      f"(baseline x{r.get('baseline_scaling', 1.0):.2f})")
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    previous = None
+    if args.previous:
+        with open(args.previous) as f:
+            previous = json.load(f)
+    problems = check_thresholds(results, thresholds, previous)
+    results["violations"] = problems
+
+    out_json = os.path.join(args.out, "tracer_bench.json")
+    with open(out_json, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"[✓] Results saved to {out_json}")
+    if problems:
+        for p in problems:
+            print(f"[!] {p}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
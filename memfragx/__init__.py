@@ -0,0 +1,30 @@
+"""
+memfragx — importable MemFragX pipeline.
+
+Submodules are imported on first attribute access so that `import memfragx`
+does not pull in pandas/matplotlib (or anything else) until a stage needs it.
+"""
+
+__all__ = ["Pipeline", "open_trace", "iter_records", "TraceFilter", "load_stats", "analyze",
+           "write_replay", "live_allocations", "analyze_directory", "diff_traces"]
+
+_EXPORTS = {
+    "Pipeline": "pipeline",
+    "open_trace": "trace_io",
+    "iter_records": "trace_io",
+    "TraceFilter": "trace_io",
+    "load_stats": "trace_cache",
+    "analyze": "analysis",
+    "write_replay": "replay",
+    "live_allocations": "replay",
+    "analyze_directory": "multiprocess",
+    "diff_traces": "diff",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,114 @@
+"""
+analysis — trace statistics and smaps footprint estimation.
+
+Shared by analysis/analysis.py and the in-process pipeline.
+"""
+
+import json
+import os
+
+from .binning import MAX_SIZE_BUCKET
+from .trace_cache import load_stats
+
+
+def estimate_smaps_memory(smaps_dir):
+    total = 0
+    for root, _, files in os.walk(smaps_dir):
+        for file in files:
+            if not file.endswith(".txt"):
+                continue
+            try:
+                with open(os.path.join(root, file)) as sf:
+                    for line in sf:
+                        if line.startswith("Rss:"):
+                            parts = line.split()
+                            total += int(parts[1])  # kB
+            except Exception:
+                continue
+    return total
+
+
+def print_report(stats, trace_path, cache_status=None):
+    print("Detected delimiter:", repr(stats.delimiter))
+    print("Detected fields:", stats.fields)
+    if cache_status == "hit":
+        print(f"[✓] Reused cached analysis for {trace_path}")
+    elif cache_status == "append":
+        print("[✓] Trace grew since last analysis; parsed only the new tail")
+    elif cache_status == "filtered":
+        print("[+] Statistics cover only the rows matching the filter")
+
+    print(f"[✓] Parsed {stats.records} trace entries from {trace_path}")
+    if stats.records:
+        print("Sample parsed record:", stats.sample)
+        print("Unique events found:", set(stats.events))
+    else:
+        print("[!] No records parsed — check delimiter or field names")
+
+    summary = stats.summary(trace_path)
+    print("\n--- Memory Trace Summary ---")
+    print(f"Total allocations : {summary['allocs']}")
+    print(f"Total frees       : {summary['frees']}")
+    print(f"Threads involved  : {summary['threads']}")
+    print(f"Total alloc bytes : {summary['total_alloc_bytes']}")
+    print(f"Net alloc bytes   : {summary['net_alloc_bytes']}")
+    print("-----------------------------")
+    return summary
+
+
+def report_smaps(smaps_folder):
+    if smaps_folder and os.path.exists(smaps_folder):
+        rss_kb = estimate_smaps_memory(smaps_folder)
+        print(f"Approx. total RSS from smaps: {rss_kb} KB")
+        return rss_kb
+    print(f"[!] smaps folder not found: {smaps_folder}")
+    return None
+
+
+def write_summary(summary, trace_path, name="summary.json"):
+    summary_path = os.path.join(os.path.dirname(trace_path), name)
+    with open(summary_path, "w") as jf:
+        json.dump(summary, jf, indent=4)
+    print(f"[✓] Summary saved to {summary_path}")
+    return summary_path
+
+
+def size_histogram(stats):
+    """(lo, hi, count) per log2 size class of ALLOC events, from the cached heat map."""
+    counts = [0] * (MAX_SIZE_BUCKET + 1)
+    for key, n in stats.heat.items():
+        counts[int(key.split(":")[1])] += n
+    return [((1 << (b - 1)) if b else 0, (1 << b) - 1, n)
+            for b, n in enumerate(counts) if n]
+
+
+def write_size_histogram(stats, out_path):
+    """Write the size histogram in the "lo hi count" format read by workload --size-hist."""
+    with open(out_path, "w") as f:
+        f.write("# lo_bytes hi_bytes count\n")
+        for lo, hi, n in size_histogram(stats):
+            f.write(f"{lo} {hi} {n}\n")
+    print(f"[✓] Size histogram saved to {out_path}")
+    return out_path
+
+
+def analyze(trace_path, smaps_folder=None, stats=None, use_cache=True, cache_status=None,
+            size_hist=None, where=None):
+    """
+    Print the trace summary, estimate RSS from smaps and write summary.json
+    (and, with `size_hist`, the allocation size histogram for the workload generator).
+    A TraceFilter `where` restricts the statistics to matching rows; the summary
+    records the filter and goes to summary_filtered.json.
+    """
+    if stats is None:
+        stats, cache_status = load_stats(trace_path, use_cache=use_cache, where=where)
+    summary = print_report(stats, trace_path, cache_status)
+    report_smaps(smaps_folder)
+    if where:
+        summary["filter"] = repr(where)
+        write_summary(summary, trace_path, "summary_filtered.json")
+    else:
+        write_summary(summary, trace_path)
+    if size_hist:
+        write_size_histogram(stats, size_hist)
+    return summary
@@ -0,0 +1,91 @@
+"""
+binning — fixed-resolution aggregates for plotting.
+
+Both structures are updated one record at a time, are JSON-serializable (so
+they live in the trace cache next to the summary) and have a size bounded by
+the plot resolution rather than the number of events.
+"""
+
+MAX_SIZE_BUCKET = 40  # 2**40 bytes
+
+
+def size_bucket(size):
+    """Log2 size class: 0 for empty, b for sizes in [2**(b-1), 2**b)."""
+    return min(int(size).bit_length(), MAX_SIZE_BUCKET)
+
+
+def bucket_label(b):
+    if b == 0:
+        return "0"
+    lo = 1 << (b - 1)
+    for unit in ("B", "K", "M", "G", "T"):
+        if lo < 1024:
+            return f"{lo}{unit}"
+        lo //= 1024
+    return f"{lo}P"
+
+
+class SeriesBins:
+    """
+    Min/max-preserving downsampling of a time series into at most `nbins` bins.
+
+    Bins start 1 ns wide and double (merging neighbours) whenever an event falls
+    past the last bin, so spikes survive at any trace length and the result is
+    the same whether the trace was scanned at once or in appended pieces.
+    """
+
+    def __init__(self, nbins=2048):
+        self.nbins = nbins
+        self.t0 = None
+        self.width = 1
+        self.lo = []
+        self.hi = []
+        self.last = []
+
+    def _grow(self):
+        lo, hi, last = [], [], []
+        for j in range(0, len(self.lo), 2):
+            pair = [k for k in (j, j + 1) if k < len(self.lo) and self.lo[k] is not None]
+            if not pair:
+                lo.append(None); hi.append(None); last.append(None)
+                continue
+            lo.append(min(self.lo[k] for k in pair))
+            hi.append(max(self.hi[k] for k in pair))
+            last.append(self.last[pair[-1]])
+        self.lo, self.hi, self.last = lo, hi, last
+        self.width *= 2
+
+    def add(self, ts, value):
+        if self.t0 is None:
+            self.t0 = ts
+        i = max(0, (ts - self.t0) // self.width)
+        while i >= self.nbins:
+            self._grow()
+            i = (ts - self.t0) // self.width
+        if i >= len(self.lo):
+            pad = i + 1 - len(self.lo)
+            self.lo += [None] * pad
+            self.hi += [None] * pad
+            self.last += [None] * pad
+        if self.lo[i] is None:
+            self.lo[i] = self.hi[i] = value
+        else:
+            if value < self.lo[i]:
+                self.lo[i] = value
+            if value > self.hi[i]:
+                self.hi[i] = value
+        self.last[i] = value
+
+    def points(self):
+        """(offset_ns, lo, hi, last) for every non-empty bin."""
+        return [((i + 0.5) * self.width, self.lo[i], self.hi[i], self.last[i])
+                for i in range(len(self.lo)) if self.lo[i] is not None]
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        series = cls(d["nbins"])
+        series.__dict__.update(d)
+        return series
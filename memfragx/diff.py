@@ -0,0 +1,347 @@
+"""
+diff — compare the allocation behaviour of two traces (e.g. before/after a deploy).
+
+Each trace is reduced in one streaming pass to an AllocProfile: per-size-class
+counts and bytes, per-thread counts, a log2 histogram of object lifetimes, peak
+live bytes and what is still live at the end. Memory is bounded by the number
+of live objects, not the trace length, and the two traces are profiled in
+parallel worker processes.
+
+Distribution changes (size classes, lifetimes, work per thread) are tested with a chi-square
+test on the 2 x k contingency table; a change is flagged when p < alpha and
+the effect size (Cramér's V) is at least `min_effect`, so huge captures do not
+flag negligible shifts. Scalar metrics (peak live bytes, bytes still live at
+exit, fragmentation ratio) are flagged when they grow by more than `tolerance`.
+
+The trace carries no call sites, so "per-site" statistics are per-thread here.
+Thread ids differ between runs, so threads are matched by rank: the busiest
+thread of A against the busiest of B, and so on, and the test asks whether
+allocations are spread over the threads differently.
+REALLOC rows carry only the new pointer: a moved block's old pointer is not
+seen as freed.
+
+Usage:
+  python3 -m memfragx.diff <trace_A> <trace_B> [--smaps-a S] [--smaps-b S]
+                           [--alpha 0.01] [--min-effect 0.05] [--tolerance 0.10]
+                           [--json diff.json] [--fail-on-regression]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .binning import MAX_SIZE_BUCKET, bucket_label, size_bucket
+from .trace_io import ALLOC_EVENTS, iter_records
+
+LIFETIME_BUCKETS = 64  # log2(ns)
+
+
+class AllocProfile:
+    """Streaming allocation-behaviour aggregates of one trace."""
+
+    def __init__(self):
+        self.records = 0
+        self.allocs = 0
+        self.frees = 0
+        self.unmatched_frees = 0
+        self.class_counts = [0] * (MAX_SIZE_BUCKET + 1)
+        self.class_bytes = [0] * (MAX_SIZE_BUCKET + 1)
+        self.threads = {}                    # tid -> [allocs, bytes]
+        self.lifetimes = [0] * LIFETIME_BUCKETS
+        self.live = {}                       # ptr -> (size, ts_ns)
+        self.live_bytes = 0
+        self.peak_live_bytes = 0
+        self.peak_ts = None
+        self.rss_kb = None
+
+    def add(self, rec):
+        self.records += 1
+        ev = rec["event"]
+        if ev in ALLOC_EVENTS:
+            size, ptr = rec["size"], rec["ptr"]
+            self.allocs += 1
+            b = size_bucket(size)
+            self.class_counts[b] += 1
+            self.class_bytes[b] += size
+            t = self.threads.setdefault(rec["tid"], [0, 0])
+            t[0] += 1
+            t[1] += size
+            old = self.live.get(ptr)
+            if old is not None:              # in-place realloc
+                self.live_bytes -= old[0]
+            self.live[ptr] = (size, rec["ts_ns"])
+            self.live_bytes += size
+            if self.live_bytes > self.peak_live_bytes:
+                self.peak_live_bytes = self.live_bytes
+                self.peak_ts = rec["ts_ns"]
+        elif ev == "FREE":
+            self.frees += 1
+            entry = self.live.pop(rec["ptr"], None)
+            if entry is None:
+                self.unmatched_frees += 1
+                return
+            size, ts = entry
+            self.live_bytes -= size
+            life = max(0, rec["ts_ns"] - ts)
+            self.lifetimes[min(life.bit_length(), LIFETIME_BUCKETS - 1)] += 1
+
+    def finish(self, smaps=None):
+        """Drop the per-object state; keep what is still live as scalars."""
+        self.live_at_exit = len(self.live)
+        self.live_bytes_at_exit = self.live_bytes
+        self.live = {}
+        if smaps and os.path.exists(smaps):
+            self.rss_kb = smaps_rss_kb(smaps)
+        return self
+
+    def fragmentation_ratio(self):
+        """RSS over peak live heap bytes; None without an smaps snapshot."""
+        if not self.rss_kb or not self.peak_live_bytes:
+            return None
+        return self.rss_kb * 1024 / self.peak_live_bytes
+
+    def to_dict(self):
+        d = {k: v for k, v in self.__dict__.items() if k != "live"}
+        d["threads"] = {str(k): v for k, v in self.threads.items()}
+        d["fragmentation_ratio"] = self.fragmentation_ratio()
+        return d
+
+
+def smaps_rss_kb(path):
+    """
+    Total Rss of an smaps file. For a directory of *.txt snapshots (snapshotter.py)
+    this is the peak over the snapshots, so it does not grow with their number.
+    """
+    if os.path.isdir(path):
+        snapshots = [os.path.join(root, name) for root, _, files in os.walk(path)
+                     for name in files if name.endswith(".txt")]
+        return max((smaps_rss_kb(p) for p in snapshots), default=0)
+    total = 0
+    with open(path, errors="replace") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                total += int(line.split()[1])
+    return total
+
+
+def profile_trace(path, smaps=None):
+    prof = AllocProfile()
+    for rec in iter_records(path):
+        prof.add(rec)
+    return prof.finish(smaps)
+
+
+def _profile_job(args):
+    return profile_trace(*args)
+
+
+# --- statistics ---
+def chi2_sf(x, dof):
+    """P(X > x) for a chi-square variable: the regularized upper incomplete gamma Q(dof/2, x/2)."""
+    if x <= 0 or dof <= 0:
+        return 1.0
+    a, x = dof / 2.0, x / 2.0
+    gln = math.lgamma(a)
+    if x < a + 1:                            # series for P, then Q = 1 - P
+        term = total = 1.0 / a
+        n = a
+        for _ in range(1000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - gln))
+    # continued fraction for Q (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - gln) * h
+
+
+def chi2_two_sample(counts_a, counts_b):
+    """
+    Chi-square test of homogeneity for two histograms over the same bins.
+    Returns (statistic, dof, p_value, cramers_v, residuals) where residuals are
+    the per-bin adjusted standardized residuals for B (positive: more in B).
+    """
+    bins = [i for i, (a, b) in enumerate(zip(counts_a, counts_b)) if a or b]
+    na, nb = sum(counts_a), sum(counts_b)
+    n = na + nb
+    if len(bins) < 2 or not na or not nb:
+        return 0.0, 0, 1.0, 0.0, {}
+    stat, residuals = 0.0, {}
+    for i in bins:
+        col = counts_a[i] + counts_b[i]
+        for obs, row in ((counts_a[i], na), (counts_b[i], nb)):
+            exp = row * col / n
+            stat += (obs - exp) ** 2 / exp
+        exp_b = nb * col / n
+        var = exp_b * (1 - nb / n) * (1 - col / n)
+        residuals[i] = (counts_b[i] - exp_b) / math.sqrt(var) if var > 0 else 0.0
+    dof = len(bins) - 1
+    return stat, dof, chi2_sf(stat, dof), math.sqrt(stat / n), residuals
+
+
+def _growth(a, b):
+    """Relative growth, or None when undefined (growth from 0 is flagged separately)."""
+    if a is None or b is None or a == 0:
+        return None
+    return (b - a) / a
+
+
+def _thread_ranks(a, b):
+    """Per-thread allocation counts of both runs, busiest first, padded to equal length."""
+    ra = sorted((t[0] for t in a.threads.values()), reverse=True)
+    rb = sorted((t[0] for t in b.threads.values()), reverse=True)
+    k = max(len(ra), len(rb))
+    return ra + [0] * (k - len(ra)), rb + [0] * (k - len(rb))
+
+
+def compare_profiles(a, b, alpha=0.01, min_effect=0.05, tolerance=0.10):
+    """Diff two AllocProfiles; returns a JSON-serializable report with flagged findings."""
+    findings = []
+    report = {"alpha": alpha, "min_effect": min_effect, "tolerance": tolerance}
+
+    ta, tb = _thread_ranks(a, b)
+    for name, ca, cb, label in (
+            ("size_classes", a.class_counts, b.class_counts, bucket_label),
+            ("lifetimes", a.lifetimes, b.lifetimes, lambda i: f"<2^{i}ns"),
+            ("thread_shares", ta, tb, lambda i: f"thread #{i + 1}")):
+        stat, dof, p, v, resid = chi2_two_sample(ca, cb)
+        flagged = p < alpha and v >= min_effect
+        na, nb = sum(ca) or 1, sum(cb) or 1
+        rows = [{"bin": label(i), "a": ca[i], "b": cb[i],
+                 "share_a": ca[i] / na, "share_b": cb[i] / nb, "residual": r}
+                for i, r in sorted(resid.items())]
+        report[name] = {"chi2": stat, "dof": dof, "p_value": p, "cramers_v": v,
+                        "flagged": flagged, "bins": rows}
+        if flagged:
+            top = max(rows, key=lambda r: abs(r["residual"]))
+            findings.append(f"{name} distribution changed (p={p:.2e}, V={v:.3f}); "
+                            f"largest shift at {top['bin']}: "
+                            f"{top['share_a']:.1%} -> {top['share_b']:.1%}")
+
+    for name, va, vb in (
+            ("peak_live_bytes", a.peak_live_bytes, b.peak_live_bytes),
+            ("live_bytes_at_exit", a.live_bytes_at_exit, b.live_bytes_at_exit),
+            ("fragmentation_ratio", a.fragmentation_ratio(), b.fragmentation_ratio())):
+        g = _growth(va, vb)
+        from_zero = va == 0 and bool(vb)
+        flagged = from_zero or (g is not None and g > tolerance)
+        report[name] = {"a": va, "b": vb, "growth": g, "flagged": flagged}
+        if from_zero:
+            findings.append(f"{name} grew from 0 to {vb}")
+        elif flagged:
+            findings.append(f"{name} grew {g:+.1%} ({va} -> {vb})")
+
+    report["counts"] = {k: {"a": getattr(a, k), "b": getattr(b, k)}
+                        for k in ("records", "allocs", "frees", "unmatched_frees", "live_at_exit")}
+    report["threads"] = {"a": len(a.threads), "b": len(b.threads),
+                         "top_share_a": _top_share(a), "top_share_b": _top_share(b),
+                         "flagged": report["thread_shares"]["flagged"]}
+    report["findings"] = findings
+    return report
+
+
+def _top_share(prof):
+    """Share of allocations made by the busiest thread."""
+    if not prof.threads:
+        return 0.0
+    return max(t[0] for t in prof.threads.values()) / max(1, prof.allocs)
+
+
+def diff_traces(trace_a, trace_b, smaps_a=None, smaps_b=None, parallel=True, **thresholds):
+    """Profile both traces (in parallel worker processes) and compare them."""
+    jobs = [(trace_a, smaps_a), (trace_b, smaps_b)]
+    if parallel:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            a, b = pool.map(_profile_job, jobs)
+    else:
+        a, b = (_profile_job(job) for job in jobs)
+    report = compare_profiles(a, b, **thresholds)
+    report["trace_a"], report["trace_b"] = trace_a, trace_b
+    report["profile_a"], report["profile_b"] = a.to_dict(), b.to_dict()
+    return report
+
+
+def print_diff(report):
+    counts = report["counts"]
+    print("\n--- Trace Diff (A -> B) ---")
+    print(f"A: {report['trace_a']}")
+    print(f"B: {report['trace_b']}")
+    print(f"Allocations       : {counts['allocs']['a']} -> {counts['allocs']['b']}")
+    print(f"Frees             : {counts['frees']['a']} -> {counts['frees']['b']}")
+    print(f"Threads           : {report['threads']['a']} -> {report['threads']['b']}")
+    for key in ("peak_live_bytes", "live_bytes_at_exit", "fragmentation_ratio"):
+        r = report[key]
+        if r["growth"] is not None:
+            growth = f"{r['growth']:+.1%}"
+        else:
+            growth = "from 0" if r["flagged"] else "n/a"
+        print(f"{key:18s}: {r['a']} -> {r['b']} ({growth})")
+    for key in ("size_classes", "lifetimes", "thread_shares"):
+        r = report[key]
+        print(f"{key:18s}: chi2={r['chi2']:.1f} dof={r['dof']} p={r['p_value']:.2e} "
+              f"V={r['cramers_v']:.3f}")
+        for row in sorted(r["bins"], key=lambda row: -abs(row["residual"]))[:5]:
+            print(f"    {row['bin']:>10s}  {row['share_a']:7.2%} -> {row['share_b']:7.2%}  "
+                  f"(residual {row['residual']:+.1f})")
+    print("----------------------------")
+    if report["findings"]:
+        for f in report["findings"]:
+            print(f"[!] {f}")
+    else:
+        print("[✓] No significant allocation-behaviour changes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the allocation behaviour of two traces.")
+    parser.add_argument("trace_a")
+    parser.add_argument("trace_b")
+    parser.add_argument("--smaps-a", help="smaps snapshot (file or directory) of run A")
+    parser.add_argument("--smaps-b", help="smaps snapshot (file or directory) of run B")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    parser.add_argument("--min-effect", type=float, default=0.05, help="minimum Cramér's V to flag")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative growth of peak/exit live bytes or fragmentation to flag")
+    parser.add_argument("--json", help="write the full report here")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with status 2 when anything is flagged")
+    args = parser.parse_args()
+
+    for path in (args.trace_a, args.trace_b):
+        if not os.path.exists(path):
+            print(f"[!] Trace file not found: {path}")
+            sys.exit(1)
+    print(f"[+] Profiling {args.trace_a} and {args.trace_b}...")
+    report = diff_traces(args.trace_a, args.trace_b, args.smaps_a, args.smaps_b,
+                         alpha=args.alpha, min_effect=args.min_effect, tolerance=args.tolerance)
+    print_diff(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"[✓] Diff saved to {args.json}")
+    if args.fail_on_regression and report["findings"]:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+multiprocess — analysis of a traced process tree.
+
+The tracer writes one trace per process: the root process uses MFTRACE_LOG
+as-is, forked children and exec'd descendants write "<stem>.<pid><ext>" next
+to it. This module finds those files, aggregates each one in a worker
+process (through the trace cache) and reports per-process and overall
+totals.
+
+Usage:
+  python3 -m memfragx.multiprocess <trace_dir> [--workers N] [--no-cache]
+"""
+
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .analysis import write_summary
+from .trace_cache import load_stats
+from .trace_io import read_header
+
+TRACE_EXTS = (".csv", ".mfz")
+
+
+def process_traces(root):
+    """Descendant traces of the root trace `root`: "<stem>.<pid>[-n]<ext>" with the root's ext."""
+    directory, name = os.path.split(root)
+    stem, ext = os.path.splitext(name)
+    pattern = re.compile(re.escape(stem) + r"\.(\d+)(?:-(\d+))?" + re.escape(ext) + "$")
+    found = []
+    for other in os.listdir(directory or "."):
+        m = pattern.match(other)
+        if m:
+            found.append(((int(m.group(1)), int(m.group(2) or 0)), os.path.join(directory, other)))
+    return [path for _, path in sorted(found)]
+
+
+def _trace_identity(path):
+    # pid + clock base tell two copies of one trace (e.g. .csv and its .mfz) apart from
+    # different processes; an exec'd image keeps its pid but gets a new clock base
+    try:
+        meta = read_header(path).meta
+    except (OSError, ValueError):
+        return path
+    if "pid" not in meta or "base_wall_ns" not in meta:
+        return path
+    return meta["pid"], meta["base_wall_ns"]
+
+
+def find_traces(directory, root=None):
+    """
+    The root trace (`root`, or the mftrace*.csv|.mfz in `directory` with the most
+    descendants) first, then its descendants by pid. Files holding the same
+    process's trace (same pid and clock base) are listed once.
+    """
+    if root is None:
+        roots = sorted((name for name in os.listdir(directory)
+                        if name.startswith("mftrace") and name.endswith(TRACE_EXTS)
+                        and not re.search(r"\.\d+(?:-\d+)?\.\w+$", name)),
+                       key=lambda name: TRACE_EXTS.index(os.path.splitext(name)[1]))
+        if not roots:
+            return []
+        root = max((os.path.join(directory, name) for name in roots),
+                   key=lambda path: len(process_traces(path)))
+    traces, seen = [], set()
+    for path in ([root] if os.path.exists(root) else []) + process_traces(root):
+        identity = _trace_identity(path)
+        if identity not in seen:
+            seen.add(identity)
+            traces.append(path)
+    return traces
+
+
+def _load(args):
+    path, use_cache = args
+    stats, status = load_stats(path, use_cache=use_cache)
+    return path, stats, status
+
+
+def analyze_directory(directory, workers=None, use_cache=True, summary_name="summary.json",
+                      root=None):
+    """
+    Aggregate every trace of the process tree in `directory` (rooted at `root`,
+    see find_traces) in parallel and write one summary (summary.json by default)
+    with a "processes" list and an "overall" total.
+    """
+    traces = find_traces(directory, root)
+    if not traces:
+        print(f"[!] No mftrace traces found in {directory}")
+        return None
+    print(f"[+] Analyzing {len(traces)} process trace(s) in {directory}")
+
+    jobs = [(path, use_cache) for path in traces]
+    if len(traces) == 1 or workers == 1:
+        results = [_load(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_load, jobs))
+
+    processes, overall = [], None
+    for path, stats, status in results:
+        summary = stats.summary(path)
+        summary["pid"] = int(stats.meta["pid"]) if "pid" in stats.meta else None
+        summary["cache"] = status
+        processes.append(summary)
+        print(f"    pid {str(summary['pid']):>8s}  {summary['records']:>10d} records  "
+              f"{summary['net_alloc_bytes']:>12d} net bytes  ({os.path.basename(path)})")
+        if overall is None:
+            overall = {k: 0 for k in ("records", "allocs", "frees", "threads",
+                                      "total_alloc_bytes", "net_alloc_bytes")}
+        for key in overall:
+            overall[key] += summary[key]
+    overall["processes"] = len(processes)
+
+    print("\n--- Process Tree Summary ---")
+    print(f"Processes         : {overall['processes']}")
+    print(f"Total allocations : {overall['allocs']}")
+    print(f"Total frees       : {overall['frees']}")
+    print(f"Threads involved  : {overall['threads']}")
+    print(f"Total alloc bytes : {overall['total_alloc_bytes']}")
+    print(f"Net alloc bytes   : {overall['net_alloc_bytes']}")
+    print("-----------------------------")
+
+    summary = {"trace_dir": os.path.abspath(directory), "overall": overall,
+               "processes": processes}
+    write_summary(summary, os.path.join(directory, summary_name), summary_name)
+    return summary
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m memfragx.multiprocess <trace_dir> [--workers N] [--no-cache]")
+        sys.exit(1)
+    workers = None
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    analyze_directory(sys.argv[1], workers=workers, use_cache="--no-cache" not in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+pipeline — run analysis, replay generation and visualization in one process.
+
+The trace is scanned once; every stage that needs per-record data registers a
+consumer for that scan, so nothing is re-imported or re-parsed between stages.
+Analysis and plots only need the cached aggregates (TraceStats), so without a
+replay stage the scan is skipped entirely on a cache hit.
+
+    pipe = Pipeline("results/run/mftrace_log.csv", stages=("analyze", "replay", "viz"))
+    pipe.analyze("results/run/smaps")
+    pipe.generate_replay("results/run/replay.c")
+    pipe.visualize("results/run/smaps", "results/run/smaps_replay")
+"""
+
+import os
+
+from .analysis import analyze
+from .replay import DEFAULT_MAX_OBJECTS, DEFAULT_MAX_PER_OBJ, LiveAllocations, write_replay
+from .trace_cache import TraceStats, load_stats
+from .trace_io import iter_records, read_header
+
+STAGES = ("analyze", "replay", "viz")
+
+
+class Pipeline:
+    def __init__(self, trace_path, out_dir=None, stages=STAGES, use_cache=True):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"unknown pipeline stages: {sorted(unknown)}")
+        self.trace_path = trace_path
+        self.out_dir = out_dir or os.path.dirname(trace_path) or "results"
+        self.stages = tuple(stages)
+        self.use_cache = use_cache
+        self.stats = None
+        self.live = None
+        self._loaded = False
+
+    def load(self):
+        """Scan the trace once, feeding every consumer the requested stages need."""
+        if self._loaded:
+            return self
+        consumers = []
+        if "replay" in self.stages:
+            self.live = LiveAllocations()
+            consumers.append(self.live)
+        if consumers:
+            self.stats = TraceStats()
+            hdr = read_header(self.trace_path)
+            self.stats.meta, self.stats.delimiter, self.stats.fields = hdr.meta, hdr.delimiter, hdr.fields
+            consumers.append(self.stats)
+            for rec in iter_records(self.trace_path):
+                for c in consumers:
+                    c.add(rec)
+        self._loaded = True
+        return self
+
+    def _stats(self):
+        self.load()
+        status = None
+        if self.stats is None:
+            self.stats, status = load_stats(self.trace_path, use_cache=self.use_cache)
+        return self.stats, status
+
+    def analyze(self, smaps_folder=None):
+        stats, status = self._stats()
+        return analyze(self.trace_path, smaps_folder, stats=stats, cache_status=status)
+
+    def generate_replay(self, out_path, max_objects=DEFAULT_MAX_OBJECTS,
+                        max_per_obj=DEFAULT_MAX_PER_OBJ):
+        if "replay" not in self.stages:
+            raise RuntimeError("pipeline was created without the 'replay' stage")
+        self.load()
+        return write_replay(self.live.sizes(), out_path, max_objects, max_per_obj)
+
+    def visualize(self, smapsA=None, smapsB=None):
+        if "viz" not in self.stages:
+            raise RuntimeError("pipeline was created without the 'viz' stage")
+        stats, _ = self._stats()
+        from .viz import bins_from_stats, render
+        render(bins_from_stats(stats), self.out_dir, smapsA, smapsB)
@@ -0,0 +1,159 @@
+"""
+profiling — per-stage timing for the pipeline scripts.
+
+Each script wraps its stages (trace, smaps capture, analysis, replay compile,
+plotting, ...) in `prof.stage(name)`. A stage records wall time, CPU time of
+this process and of children it waited for (the traced program, gcc, the
+replay), the process-wide peak RSS of both and how much the stage raised it,
+and the items it processed:
+
+    prof, argv = parse_profile_argv(sys.argv, "analysis")
+    with prof.stage("analyze") as st:
+        summary = analyze(trace)
+        st.items = summary["allocs"] + summary["frees"]
+    prof.write(out_dir)
+
+Results go to <out_dir>/pipeline_profile.json under the script's name, so
+trace_any.py, analysis.py and metrics_viz.py runs on one output directory end
+up side by side. Flags (stripped from argv by parse_profile_argv):
+
+  --profile      record stage timings
+  --cprofile     also run cProfile per stage -> profile_<tool>_<stage>.prof
+  --tracemalloc  also record each stage's peak Python heap and top allocation sites
+
+Without any flag the profiler is disabled and stage() costs one context manager.
+"""
+
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+PROFILE_NAME = "pipeline_profile.json"
+PROFILE_FLAGS = ("--profile", "--cprofile", "--tracemalloc")
+TRACEMALLOC_TOP = 10
+
+
+class Stage:
+    """What one stage reports; scripts set `items` (and `unit`) while it runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = None
+        self.unit = "records"
+        self.extra = {}
+
+    def to_dict(self):
+        d = {"name": self.name}
+        d.update(self.extra)
+        return d
+
+
+class Profiler:
+    def __init__(self, tool, enabled=False, cprofile=False, tracemalloc=False):
+        self.tool = tool
+        self.enabled = enabled or cprofile or tracemalloc
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.stages = []
+        self._profiles = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        st = Stage(name)
+        if not self.enabled:
+            yield st
+            return
+        prof = None
+        if self.cprofile:
+            import cProfile
+            prof = cProfile.Profile()
+        if self.tracemalloc:
+            import tracemalloc
+            tracemalloc.start()
+        self_before = resource.getrusage(resource.RUSAGE_SELF)
+        kids_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t0 = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield st
+        finally:
+            if prof:
+                prof.disable()
+                self._profiles[name] = prof
+            wall = time.perf_counter() - t0
+            self_after = resource.getrusage(resource.RUSAGE_SELF)
+            kids_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            st.extra.update({
+                "wall_s": round(wall, 6),
+                "cpu_s": round(self_after.ru_utime + self_after.ru_stime
+                               - self_before.ru_utime - self_before.ru_stime, 6),
+                "children_cpu_s": round(kids_after.ru_utime + kids_after.ru_stime
+                                        - kids_before.ru_utime - kids_before.ru_stime, 6),
+                # ru_maxrss is a high-water mark (KB on Linux): the peak of the whole
+                # process so far; the *_growth_kb fields are how far this stage raised it
+                "process_peak_rss_kb": self_after.ru_maxrss,
+                "peak_rss_growth_kb": self_after.ru_maxrss - self_before.ru_maxrss,
+                "children_process_peak_rss_kb": kids_after.ru_maxrss,
+                "children_peak_rss_growth_kb": kids_after.ru_maxrss - kids_before.ru_maxrss,
+            })
+            if st.items is not None:
+                st.extra["items"] = st.items
+                st.extra["unit"] = st.unit
+                st.extra["items_per_s"] = round(st.items / wall, 1) if wall > 0 else None
+            if self.tracemalloc:
+                st.extra.update(_tracemalloc_report())
+            self.stages.append(st)
+            print(f"[+] stage {name}: {wall:.3f}s wall, {st.extra['cpu_s']:.3f}s cpu")
+
+    def to_dict(self):
+        return {
+            "total_wall_s": round(time.perf_counter() - self._t0, 6),
+            "cprofile": self.cprofile,
+            "tracemalloc": self.tracemalloc,
+            "stages": [st.to_dict() for st in self.stages],
+        }
+
+    def write(self, out_dir):
+        """Merge this run into <out_dir>/pipeline_profile.json; dump cProfile stats next to it."""
+        if not self.enabled:
+            return None
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, PROFILE_NAME)
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        data[self.tool] = self.to_dict()
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+        for name, prof in self._profiles.items():
+            prof.dump_stats(os.path.join(out_dir, f"profile_{self.tool}_{name}.prof"))
+        print(f"[✓] Stage profile saved to {path}")
+        return path
+
+
+def _tracemalloc_report():
+    import tracemalloc
+    _, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics("lineno")[:TRACEMALLOC_TOP]
+    tracemalloc.stop()
+    return {
+        "py_heap_peak_kb": peak // 1024,
+        "py_heap_top": [{"where": str(s.traceback[0]), "kb": s.size // 1024, "blocks": s.count}
+                        for s in top],
+    }
+
+
+def parse_profile_argv(argv, tool):
+    """Strip the profiling flags from `argv`; returns (Profiler, remaining argv)."""
+    rest = [a for a in argv if a not in PROFILE_FLAGS]
+    prof = Profiler(tool, enabled="--profile" in argv, cprofile="--cprofile" in argv,
+                    tracemalloc="--tracemalloc" in argv)
+    return prof, rest
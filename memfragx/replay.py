@@ -0,0 +1,65 @@
+"""
+replay — safe compact replay generator (Approach B).
+
+Produces a non-blocking replay C program that allocates a bounded number of objects,
+touches pages to materialize them, waits a small sleep for snapshots, then frees and exits.
+"""
+
+from .trace_io import iter_records
+
+REPLAY_ALLOC_EVENTS = ("ALLOC", "CALLOC", "REALLOC", "POSIX_MEMALIGN")
+DEFAULT_MAX_OBJECTS = 5000
+DEFAULT_MAX_PER_OBJ = 16 * 1024 * 1024  # 16 MB
+
+
+class LiveAllocations:
+    """Tracks ptr -> size of allocations still live at the end of the trace."""
+
+    def __init__(self):
+        self.allocs = {}
+
+    def add(self, rec):
+        op = rec["event"]
+        if op in REPLAY_ALLOC_EVENTS:
+            self.allocs[rec["ptr"] or "0x0"] = rec["size"]
+        elif op == "FREE":
+            self.allocs.pop(rec["ptr"] or "0x0", None)
+
+    def sizes(self):
+        """Live sizes, largest first."""
+        return sorted((s for s in self.allocs.values() if s > 0), reverse=True)
+
+
+def live_allocations(trace_path):
+    live = LiveAllocations()
+    for rec in iter_records(trace_path):
+        live.add(rec)
+    return live
+
+
+def write_replay(sizes, out_path, max_objects=DEFAULT_MAX_OBJECTS, max_per_obj=DEFAULT_MAX_PER_OBJ):
+    """Write the replay program for `sizes` (largest first); returns the object count."""
+    sizes = [min(s, max_per_obj) for s in sizes][:max_objects]
+
+    with open(out_path, "w") as out:
+        out.write("/* Auto-generated safe replay program */\n")
+        out.write("#include <stdlib.h>\n#include <stdio.h>\n#include <unistd.h>\n#include <string.h>\n#include <stdint.h>\n#include <time.h>\n\nint main() {\n")
+        out.write("    size_t n = %d;\n" % len(sizes))
+        out.write("    void **arr = malloc(n * sizeof(void*));\n")
+        out.write("    if (!arr) { perror(\"malloc\"); return 1; }\n")
+        out.write("    size_t i = 0;\n")
+        for s in sizes:
+            touch = 4096 if s >= 4096 else s
+            out.write(f"    arr[i] = malloc({s}); if (!arr[i]) {{ perror(\"malloc\"); return 1; }};\n")
+            out.write(f"    memset(arr[i], 0xAB, {touch});\n")
+            out.write("    i++;\n")
+        out.write('    printf("[replay] Allocated %zu objects, holding for 3s\\n", (size_t)i);\n')
+        out.write("    fflush(stdout);\n")
+        out.write("    struct timespec ts = {8,0}; nanosleep(&ts, NULL);\n")
+        out.write("    for (size_t j=0;j<i;j++) { free(arr[j]); }\n")
+        out.write("    free(arr);\n")
+        out.write('    printf("[replay] Freed and exiting\\n"); fflush(stdout);\n')
+        out.write("    return 0;\n}\n")
+
+    print("Wrote safe replay to", out_path, " (objects:", len(sizes), ")")
+    return len(sizes)
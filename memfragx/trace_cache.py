@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+trace_cache.py — content-addressed, incremental cache of trace aggregates
+
+Every consumer of a trace (analysis.py for A, again for A-vs-B, the trim
+experiment) used to re-parse the whole file. Aggregates are now cached per
+trace, keyed by the trace's real path and a hash of its header, and validated
+against size/mtime:
+
+  * unchanged trace  -> aggregates are returned without reading the trace
+  * appended trace   -> only the new tail is parsed (CSV: bytes past the last
+                        complete line seen; mfz: blocks past the last one seen)
+  * anything else    -> full parse
+
+The cache lives in $MEMFRAGX_CACHE_DIR (default ~/.cache/memfragx).
+
+Usage:
+  python3 -m memfragx.trace_cache <trace> [--no-cache]
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+from .binning import SeriesBins, size_bucket
+from .trace_io import (ALLOC_EVENTS, TraceClock, is_block_trace, iter_block_data,
+                      iter_records, parse_header_text, parse_row, read_block, read_header,
+                      read_index)
+
+CACHE_VERSION = 4
+TAIL_BYTES = 4096
+
+
+def cache_dir():
+    return os.environ.get("MEMFRAGX_CACHE_DIR") or \
+        os.path.join(os.path.expanduser("~"), ".cache", "memfragx")
+
+
+class TraceStats:
+    """
+    Aggregates of one trace, updatable record by record: the analysis summary
+    plus the pre-binned plotting data (thread x log2-size ALLOC counts and the
+    min/max-downsampled net-allocated series).
+    """
+
+    def __init__(self):
+        self.delimiter = ","
+        self.fields = []
+        self.meta = {}          # tracer header metadata (clock source etc.)
+        self.records = 0
+        self.allocs = 0
+        self.frees = 0
+        self.total_alloc = 0
+        self.free_bytes = 0
+        self.tids = set()
+        self.events = set()
+        self.sample = None
+        self.heat = {}          # "tid:size_bucket" -> ALLOC count
+        self.net_bytes = 0
+        self.series = SeriesBins()
+
+    def add(self, rec):
+        if self.sample is None:
+            self.sample = rec
+        ev = rec["event"]
+        self.records += 1
+        self.events.add(ev)
+        self.tids.add(rec["tid"])
+        if ev in ALLOC_EVENTS:
+            self.allocs += 1
+            self.total_alloc += rec["size"]
+        elif ev == "FREE":
+            self.frees += 1
+            self.free_bytes += rec["size"]
+
+        if ev == "ALLOC":
+            key = f"{rec['tid']}:{size_bucket(rec['size'])}"
+            self.heat[key] = self.heat.get(key, 0) + 1
+            self.net_bytes += rec["size"]
+            self.series.add(rec["ts_ns"], self.net_bytes)
+        elif ev == "FREE":
+            self.net_bytes -= rec["size"]
+            self.series.add(rec["ts_ns"], self.net_bytes)
+
+    def summary(self, trace_file):
+        """The summary.json payload written by analysis.py."""
+        return {
+            "trace_file": os.path.basename(trace_file),
+            "records": self.records,
+            "allocs": self.allocs,
+            "frees": self.frees,
+            "threads": len(self.tids),
+            "total_alloc_bytes": self.total_alloc,
+            "net_alloc_bytes": self.total_alloc - self.free_bytes,
+        }
+
+    def to_dict(self):
+        d = dict(self.__dict__)
+        d["tids"] = sorted(self.tids)
+        d["events"] = sorted(self.events)
+        d["series"] = self.series.to_dict()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.__dict__.update(d)
+        stats.tids = set(d["tids"])
+        stats.events = set(d["events"])
+        stats.series = SeriesBins.from_dict(d["series"])
+        return stats
+
+
+# --- scanning ---
+def _set_header(stats, header_text):
+    hdr = parse_header_text(header_text)
+    stats.meta, stats.delimiter, stats.fields = hdr.meta, hdr.delimiter, hdr.fields
+
+
+def _row_clock(stats):
+    clock = TraceClock(stats.meta)
+    return None if clock.identity else clock
+
+
+def _scan_csv(path, stats, offset):
+    """Parse complete lines from byte `offset`; returns the offset after the last one."""
+    with open(path, "rb") as f:
+        if offset == 0:
+            header = b""
+            while True:                      # '#' metadata lines, then column names
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    return 0
+                header += line
+                if not line.lstrip(b"\xef\xbb\xbf").startswith(b"#"):
+                    break
+            _set_header(stats, header.decode("utf-8-sig"))
+            offset = f.tell()
+        f.seek(offset)
+        delim, fields, clock = stats.delimiter, stats.fields, _row_clock(stats)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partial line still being written; pick it up next time
+            offset += len(line)
+            rec = parse_row(fields, line.decode("utf-8", "replace"), delim, clock)
+            if rec is not None:
+                stats.add(rec)
+    return offset
+
+
+def _scan_mfz(path, stats, blocks, done):
+    if done == 0:
+        header_text, _ = read_index(path)
+        _set_header(stats, header_text)
+    delim, fields, clock = stats.delimiter, stats.fields, _row_clock(stats)
+    for data in iter_block_data(path, blocks=blocks[done:]):
+        for line in data.decode("utf-8", "replace").splitlines():
+            rec = parse_row(fields, line, delim, clock)
+            if rec is not None:
+                stats.add(rec)
+    return len(blocks)
+
+
+# --- fingerprints ---
+def _hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _header_hash(path):
+    # mfz: the full header text (pid, base_wall_ns, ...), not just the fixed binary prefix
+    if is_block_trace(path):
+        return _hash(read_index(path)[0].encode())
+    with open(path, "rb") as f:
+        return _hash(f.readline())
+
+
+def _tail_hash(path, offset):
+    with open(path, "rb") as f:
+        start = max(0, offset - TAIL_BYTES)
+        f.seek(start)
+        return _hash(f.read(offset - start))
+
+
+def _index_hash(path, blocks):
+    """Hash of the block index plus the content of the last block (the mfz analogue of _tail_hash)."""
+    h = hashlib.sha1(repr([tuple(b) for b in blocks]).encode())
+    if blocks:
+        with open(path, "rb") as f:
+            h.update(read_block(f, blocks[-1].offset))
+    return h.hexdigest()
+
+
+def _entry_path(path, header_hash):
+    key = _hash((os.path.realpath(path) + "\0" + header_hash).encode())
+    return os.path.join(cache_dir(), key[:32] + ".json")
+
+
+def _load_entry(entry_path):
+    try:
+        with open(entry_path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("version") == CACHE_VERSION else None
+
+
+def _store_entry(entry_path, entry):
+    try:
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, entry_path)
+    except OSError as e:
+        print(f"[!] Could not write analysis cache: {e}")
+
+
+def filtered_stats(path, where):
+    """TraceStats of the rows matching a TraceFilter (computed with pushdown, never cached)."""
+    stats = TraceStats()
+    hdr = read_header(path)
+    stats.meta, stats.delimiter, stats.fields = hdr.meta, hdr.delimiter, hdr.fields
+    for rec in iter_records(path, where):
+        stats.add(rec)
+    return stats
+
+
+def load_stats(path, use_cache=True, where=None):
+    """
+    Return (TraceStats, status) for a trace; status is "hit", "append" or "miss".
+    With use_cache=False the trace is always parsed fully and nothing is stored.
+    With a TraceFilter `where` only matching rows are aggregated (status "filtered").
+    """
+    if where:
+        return filtered_stats(path, where), "filtered"
+    st = os.stat(path)
+    block = is_block_trace(path)
+    header_hash = _header_hash(path)
+    entry_path = _entry_path(path, header_hash)
+    entry = _load_entry(entry_path) if use_cache else None
+
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return TraceStats.from_dict(entry["stats"]), "hit"
+
+    stats, status, done = TraceStats(), "miss", 0
+    blocks = read_index(path)[1] if block else None
+    if entry and entry["size"] <= st.st_size:
+        done = entry["done"]
+        if block:
+            resumable = done <= len(blocks) and entry["tail"] == _index_hash(path, blocks[:done])
+        else:
+            resumable = entry["tail"] == _tail_hash(path, done)
+        if resumable:
+            stats, status = TraceStats.from_dict(entry["stats"]), "append"
+        else:
+            done = 0
+
+    if block:
+        done = _scan_mfz(path, stats, blocks, done)
+        tail = _index_hash(path, blocks[:done])
+    else:
+        done = _scan_csv(path, stats, done)
+        tail = _tail_hash(path, done)
+
+    if use_cache:
+        _store_entry(entry_path, {
+            "version": CACHE_VERSION,
+            "trace": os.path.realpath(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "header": header_hash,
+            "done": done,
+            "tail": tail,
+            "stats": stats.to_dict(),
+        })
+    return stats, status
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m memfragx.trace_cache <trace> [--no-cache]")
+        sys.exit(1)
+    stats, status = load_stats(sys.argv[1], use_cache="--no-cache" not in sys.argv)
+    print(f"[cache:{status}] {json.dumps(stats.summary(sys.argv[1]))}")
+
+
+if __name__ == "__main__":
+    main()
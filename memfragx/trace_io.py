@@ -0,0 +1,711 @@
+#!/usr/bin/env python3
+"""
+trace_io.py — MemFragX trace readers/writers (plain CSV and block-compressed .mfz)
+
+The block format ("mfz") stores the usual CSV rows in independently compressed
+blocks of N events. Every block header carries its timestamp range, and a footer
+index records each block's byte offset, so time-range queries and shard workers
+only decompress the blocks they need. Files without a footer (e.g. the traced
+process was killed) are still readable by walking the block headers.
+
+Layout (little endian):
+  file header : b"MFZ1" u16 version u16 codec u32 events_per_block u32 header_len
+                <header_len bytes of uncompressed CSV header text>
+  block       : b"MFB1" u16 codec u16 flags u32 n_events u32 raw_len u32 comp_len
+                i64 ts_min i64 ts_max <comp_len bytes payload>
+  footer      : b"MFI1" u32 n_blocks n_blocks * (u64 offset i64 ts_min i64 ts_max u32 n_events)
+                u64 index_offset b"MFZE"
+
+The header text holds the tracer's '# mftrace ...' clock metadata line (see
+TraceClock) followed by the CSV column names, exactly as in a CSV trace.
+
+Codecs: 0 = stored, 1 = zlib (always available), 2 = zstd (needs `zstandard`),
+3 = lz4 (needs `lz4`). Writers fall back to zlib when the requested codec's
+module is missing.
+
+Usage:
+  python3 -m memfragx.trace_io info <trace>
+  python3 -m memfragx.trace_io compress <mftrace_log.csv> <out.mfz> [--codec zlib|zstd|lz4|raw] [--block-events N]
+  python3 -m memfragx.trace_io cat <trace> [--from NS|+S] [--to NS|+S] [--tid T,..] [--event E,..]
+                                   [--min-size B] [--max-size B]
+        (NS: wall-clock ns, +S: seconds from the first event)
+"""
+
+import io
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+
+CSV_HEADER = "ts_ns,event,ptr,size,tid\n"
+
+FILE_MAGIC = b"MFZ1"
+BLOCK_MAGIC = b"MFB1"
+INDEX_MAGIC = b"MFI1"
+END_MAGIC = b"MFZE"
+VERSION = 1
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+CODEC_NAMES = {"raw": CODEC_RAW, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD, "lz4": CODEC_LZ4}
+
+DEFAULT_BLOCK_EVENTS = 65536
+
+_FILE_HDR = struct.Struct("<4sHHII")
+_BLOCK_HDR = struct.Struct("<4sHHIIIqq")
+_INDEX_ENTRY = struct.Struct("<QqqI")
+_TRAILER = struct.Struct("<Q4s")
+
+BlockInfo = namedtuple("BlockInfo", "offset ts_min ts_max n_events")
+
+
+# --- codecs ---
+def _compress(codec, data):
+    if codec == CODEC_RAW:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, 6)
+    if codec == CODEC_ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == CODEC_LZ4:
+        import lz4.frame
+        return lz4.frame.compress(data)
+    raise ValueError(f"unknown codec {codec}")
+
+
+def _decompress(codec, data, raw_len):
+    if codec == CODEC_RAW:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("trace block uses zstd; install the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=raw_len)
+    if codec == CODEC_LZ4:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError("trace block uses lz4; install the 'lz4' package")
+        return lz4.frame.decompress(data)
+    raise ValueError(f"unknown codec {codec}")
+
+
+def codec_available(codec):
+    if codec in (CODEC_RAW, CODEC_ZLIB):
+        return True
+    try:
+        if codec == CODEC_ZSTD:
+            import zstandard  # noqa: F401
+        elif codec == CODEC_LZ4:
+            import lz4.frame  # noqa: F401
+        else:
+            return False
+    except ImportError:
+        return False
+    return True
+
+
+# --- reading ---
+def is_block_trace(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == FILE_MAGIC
+    except (OSError, IsADirectoryError):
+        return False
+
+
+def _read_file_header(f):
+    raw = f.read(_FILE_HDR.size)
+    if len(raw) < _FILE_HDR.size:
+        raise ValueError("truncated mfz file header")
+    magic, version, codec, per_block, header_len = _FILE_HDR.unpack(raw)
+    if magic != FILE_MAGIC:
+        raise ValueError("not an mfz trace")
+    if version != VERSION:
+        raise ValueError(f"unsupported mfz version {version}")
+    header_text = f.read(header_len).decode("utf-8")
+    return header_text, f.tell()
+
+
+def _read_footer(f, file_size):
+    if file_size < _TRAILER.size:
+        return None
+    f.seek(file_size - _TRAILER.size)
+    index_offset, end = _TRAILER.unpack(f.read(_TRAILER.size))
+    if end != END_MAGIC or index_offset >= file_size:
+        return None
+    f.seek(index_offset)
+    magic, n_blocks = struct.unpack("<4sI", f.read(8))
+    if magic != INDEX_MAGIC:
+        return None
+    data = f.read(n_blocks * _INDEX_ENTRY.size)
+    if len(data) < n_blocks * _INDEX_ENTRY.size:
+        return None
+    return [BlockInfo(*_INDEX_ENTRY.unpack_from(data, i * _INDEX_ENTRY.size))
+            for i in range(n_blocks)]
+
+
+def _scan_blocks(f, start, file_size):
+    """Rebuild the index by walking block headers (no footer, e.g. crashed writer)."""
+    blocks = []
+    pos = start
+    while pos + _BLOCK_HDR.size <= file_size:
+        f.seek(pos)
+        magic, _codec, _flags, n, _raw_len, comp_len, ts_min, ts_max = \
+            _BLOCK_HDR.unpack(f.read(_BLOCK_HDR.size))
+        if magic != BLOCK_MAGIC or pos + _BLOCK_HDR.size + comp_len > file_size:
+            break
+        blocks.append(BlockInfo(pos, ts_min, ts_max, n))
+        pos += _BLOCK_HDR.size + comp_len
+    return blocks
+
+
+def read_index(path):
+    """Return (header_text, [BlockInfo, ...]) for an mfz trace."""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header_text, data_start = _read_file_header(f)
+        blocks = _read_footer(f, file_size)
+        if blocks is None:
+            blocks = _scan_blocks(f, data_start, file_size)
+    return header_text, blocks
+
+
+def read_block(f, offset):
+    """Decompress the block at `offset` of an open binary file; returns bytes."""
+    f.seek(offset)
+    magic, codec, _flags, _n, raw_len, comp_len, _ts_min, _ts_max = \
+        _BLOCK_HDR.unpack(f.read(_BLOCK_HDR.size))
+    if magic != BLOCK_MAGIC:
+        raise ValueError(f"bad block magic at offset {offset}")
+    return _decompress(codec, f.read(comp_len), raw_len)
+
+
+def select_blocks(blocks, t_start=None, t_end=None):
+    return [b for b in blocks
+            if (t_start is None or b.ts_max >= t_start)
+            and (t_end is None or b.ts_min <= t_end)]
+
+
+def iter_block_data(path, t_start=None, t_end=None, blocks=None):
+    """Yield decompressed CSV payloads of the blocks overlapping [t_start, t_end]."""
+    if blocks is None:
+        _, blocks = read_index(path)
+    with open(path, "rb") as f:
+        for b in select_blocks(blocks, t_start, t_end):
+            yield read_block(f, b.offset)
+
+
+class _BlockStream(io.RawIOBase):
+    """Raw byte stream presenting an mfz trace as its equivalent CSV text."""
+
+    def __init__(self, path, t_start=None, t_end=None):
+        self._path = path
+        self._range = (t_start, t_end)
+        self._rewind()
+
+    def _rewind(self):
+        header_text, blocks = read_index(self._path)
+        self._chunks = iter_block_data(self._path, *self._range, blocks=blocks)
+        self._buf = header_text.encode("utf-8")
+        self._off = 0
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("mfz streams only support absolute seeks")
+        if offset < self._pos:
+            self._rewind()
+        while self._pos < offset:
+            if not self.read(min(offset - self._pos, 1 << 20)):
+                break
+        return self._pos
+
+    def readinto(self, b):
+        while self._off >= len(self._buf):
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                return 0
+            self._off = 0
+        n = min(len(b), len(self._buf) - self._off)
+        b[:n] = self._buf[self._off:self._off + n]
+        self._off += n
+        self._pos += n
+        return n
+
+
+def open_trace(path, t_start=None, t_end=None):
+    """
+    Open a trace as CSV text, whatever its on-disk format.
+    Works as a drop-in for open(path, newline='') with csv and pandas.
+    The time range only prunes whole blocks; callers still filter rows.
+    """
+    if is_block_trace(path):
+        raw = _BlockStream(path, t_start, t_end)
+        return io.TextIOWrapper(io.BufferedReader(raw, 1 << 20), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+# --- records ---
+ALLOC_EVENTS = ("ALLOC", "CALLOC", "REALLOC")
+META_PREFIX = "# mftrace"
+
+TraceHeader = namedtuple("TraceHeader", "meta delimiter fields clock")
+
+
+class TraceClock:
+    """
+    Maps raw trace timestamps to wall-clock ns using the tracer's header line
+    (`# mftrace clock=... base_wall_ns=... base_ts=... ticks_per_sec=...`).
+    Traces without that line, or recorded with the realtime clock, pass through.
+    """
+
+    def __init__(self, meta=None):
+        meta = meta or {}
+        self.name = meta.get("clock", "realtime")
+        self.base_wall = int(meta.get("base_wall_ns", 0))
+        self.base_ts = int(meta.get("base_ts", 0))
+        self.scale = 1e9 / float(meta.get("ticks_per_sec", 1e9))
+        self.identity = self.name == "realtime"
+
+    def to_wall(self, ts):
+        """Raw timestamp (int or numpy array) -> wall-clock ns."""
+        if self.identity:
+            return ts
+        delta = ts - self.base_ts
+        if self.scale != 1.0:
+            delta = delta * self.scale
+            delta = delta.astype("int64") if hasattr(delta, "astype") else int(delta)
+        return self.base_wall + delta
+
+    def to_raw(self, wall_ns):
+        """Wall-clock ns -> raw timestamp (for pruning blocks by time)."""
+        if self.identity:
+            return wall_ns
+        return self.base_ts + int((wall_ns - self.base_wall) / self.scale)
+
+
+def parse_meta(line):
+    """Parse a '# mftrace key=value ...' line into a dict (empty for other lines)."""
+    if not line.startswith(META_PREFIX):
+        return {}
+    return dict(kv.split("=", 1) for kv in line[len(META_PREFIX):].split() if "=" in kv)
+
+
+def parse_header(line):
+    """Return (delimiter, lower-cased field names) for a trace header line."""
+    line = line.lstrip("\ufeff").strip()
+    delim = max(",;\t", key=line.count)
+    return delim, [c.strip().lower() for c in line.split(delim)]
+
+
+def parse_header_text(text):
+    """TraceHeader from the header block of a trace: '#' metadata lines, then column names."""
+    meta, column_line = {}, ""
+    for line in text.lstrip("\ufeff").splitlines():
+        if line.startswith("#"):
+            meta.update(parse_meta(line))
+        else:
+            column_line = line
+            break
+    delim, fields = parse_header(column_line)
+    return TraceHeader(meta, delim, fields, TraceClock(meta))
+
+
+def read_trace_header(f):
+    """Consume the header lines of an open text trace; returns a TraceHeader."""
+    lines = []
+    while True:
+        line = f.readline()
+        lines.append(line)
+        if not line.lstrip("\ufeff").startswith("#"):
+            break
+    return parse_header_text("".join(lines))
+
+
+def _int_field(value):
+    return int(value) if value.isdigit() else 0
+
+
+def parse_row(fields, line, delim=",", clock=None):
+    """Normalize one trace row into a record dict; None for blank lines."""
+    values = line.rstrip("\r\n").split(delim)
+    if len(values) < 2:
+        return None
+    row = {k: v.strip() for k, v in zip(fields, values)}
+    ts = _int_field(row.get("ts_ns") or row.get("timestamp") or "0")
+    return {
+        "ts_ns": clock.to_wall(ts) if clock is not None else ts,
+        "event": (row.get("event") or row.get("op") or "UNKNOWN").upper(),
+        "ptr": row.get("ptr") or "",
+        "size": _int_field(row.get("size") or row.get("bytes") or "0"),
+        "tid": _int_field(row.get("tid") or row.get("thread") or "0"),
+    }
+
+
+def read_header(path):
+    """Return the TraceHeader (metadata, delimiter, fields, clock) of any trace."""
+    with open_trace(path) as f:
+        return read_trace_header(f)
+
+
+# --- filtering ---
+ORDERED_CLOCKS = ("monotonic", "monotonic-coarse", "tsc")
+
+
+class TraceFilter:
+    """
+    Row predicates pushed down into the trace readers: thread ids, a wall-clock
+    time window [t_start, t_end] in ns, event types and a size range. Any
+    predicate left as None matches everything.
+
+    The time window prunes mfz blocks by their index before decompression, and
+    binary-searches plain CSV traces recorded with an ordered clock (monotonic,
+    monotonic-coarse, tsc), stopping at the end of the window. Realtime CSV
+    traces are scanned in full, since the clock may step backwards. The other
+    predicates are checked on the split row before any record is built.
+
+    `rel_start`/`rel_end` give the window in seconds from the first event
+    instead; resolved() turns them into absolute times for a given trace.
+    """
+
+    def __init__(self, tids=None, t_start=None, t_end=None, events=None,
+                 min_size=None, max_size=None, rel_start=None, rel_end=None):
+        self.tids = set(tids) if tids is not None else None
+        self.t_start = t_start
+        self.t_end = t_end
+        self.events = {e.upper() for e in events} if events is not None else None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.rel_start = rel_start
+        self.rel_end = rel_end
+
+    def __bool__(self):
+        return any(v is not None for v in self.__dict__.values())
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items() if v is not None)
+        return f"TraceFilter({args})"
+
+    def resolved(self, path):
+        """Copy with relative window offsets turned into wall-clock ns for `path`."""
+        if self.rel_start is None and self.rel_end is None:
+            return self
+        t0 = trace_start_ns(path) or 0
+        flt = TraceFilter(**self.__dict__)
+        if self.rel_start is not None:
+            flt.t_start = t0 + int(self.rel_start * 1e9)
+        if self.rel_end is not None:
+            flt.t_end = t0 + int(self.rel_end * 1e9)
+        flt.rel_start = flt.rel_end = None
+        return flt
+
+    def raw_range(self, clock):
+        """The time window in raw clock units, widened by a tick for rounding."""
+        lo = clock.to_raw(self.t_start) - 1 if self.t_start is not None else None
+        hi = clock.to_raw(self.t_end) + 1 if self.t_end is not None else None
+        return lo, hi
+
+    def matcher(self, hdr):
+        """Return line -> bool for rows of a trace with header `hdr`."""
+        idx = {name: hdr.fields.index(name) for name in ("ts_ns", "event", "size", "tid")
+               if name in hdr.fields}
+        delim, clock = hdr.delimiter, hdr.clock
+        tids, events = self.tids, self.events
+        lo, hi = self.min_size, self.max_size
+        t_start, t_end = self.t_start, self.t_end
+        i_ts, i_ev = idx.get("ts_ns"), idx.get("event")
+        i_size, i_tid = idx.get("size"), idx.get("tid")
+
+        def match(line):
+            values = line.rstrip("\r\n").split(delim)
+            if len(values) < 2:
+                return False
+            try:
+                if events is not None and (i_ev is None or values[i_ev].strip().upper() not in events):
+                    return False
+                if tids is not None and (i_tid is None or _int_field(values[i_tid].strip()) not in tids):
+                    return False
+                if lo is not None or hi is not None:
+                    size = _int_field(values[i_size].strip()) if i_size is not None else 0
+                    if (lo is not None and size < lo) or (hi is not None and size > hi):
+                        return False
+                if (t_start is not None or t_end is not None) and i_ts is not None:
+                    ts = clock.to_wall(_int_field(values[i_ts].strip()))
+                    if (t_start is not None and ts < t_start) or (t_end is not None and ts > t_end):
+                        return False
+            except IndexError:
+                return False
+            return True
+        return match
+
+
+def trace_start_ns(path):
+    """Wall-clock ns of the first event, or None for an empty trace."""
+    if is_block_trace(path):
+        header_text, blocks = read_index(path)
+        if not blocks:
+            return None
+        return parse_header_text(header_text).clock.to_wall(min(b.ts_min for b in blocks))
+    for rec in iter_records(path):
+        return rec["ts_ns"]
+    return None
+
+
+def _first_ts(line):
+    ts = line.split(b",", 1)[0].strip()
+    return int(ts) if ts.isdigit() else None
+
+
+def _csv_seek_time(path, raw_start):
+    """Byte offset of a line start in an ordered CSV trace before which every row has ts < raw_start."""
+    with open(path, "rb") as f:
+        while True:                            # '#' metadata lines, then column names
+            line = f.readline()
+            if not line.lstrip(b"\xef\xbb\xbf").startswith(b"#"):
+                break
+        lo, hi = f.tell(), os.path.getsize(path)
+        while hi - lo > 4096:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()                       # skip to the next line start
+            pos = f.tell()
+            ts = _first_ts(f.readline())
+            if ts is not None and ts < raw_start:
+                lo = pos
+            else:
+                hi = mid
+        return lo
+
+
+def iter_lines(path, where=None):
+    """
+    Yield the TraceHeader of `path`, then every raw data line matching the
+    TraceFilter `where` (all lines without one).
+    """
+    where = where.resolved(path) if where else None
+    block = is_block_trace(path)
+    header_text = read_index(path)[0] if block and where else None
+    raw_lo = raw_hi = None
+    if where:
+        clock = parse_header_text(header_text).clock if block else read_header(path).clock
+        raw_lo, raw_hi = where.raw_range(clock)
+    with open_trace(path, raw_lo, raw_hi) as f:
+        hdr = read_trace_header(f)
+        yield hdr
+        if not where:
+            yield from f
+            return
+        ordered = not block and hdr.meta.get("clock") in ORDERED_CLOCKS
+        if ordered and raw_lo is not None:
+            f.seek(_csv_seek_time(path, raw_lo))
+        match = where.matcher(hdr)
+        for line in f:
+            if match(line):
+                yield line
+            elif ordered and raw_hi is not None:
+                ts = line.split(hdr.delimiter, 1)[0]
+                if ts.isdigit() and int(ts) > raw_hi:
+                    return
+
+
+def iter_records(path, where=None):
+    """Yield normalized records (ts_ns, event, ptr, size, tid) from any trace.
+    Timestamps are converted to wall-clock ns whatever clock the tracer used.
+    `where` is an optional TraceFilter applied while scanning."""
+    lines = iter_lines(path, where)
+    hdr = next(lines)
+    clock = None if hdr.clock.identity else hdr.clock
+    for line in lines:
+        rec = parse_row(hdr.fields, line, hdr.delimiter, clock)
+        if rec is not None:
+            yield rec
+
+
+def _parse_time(value):
+    """'+S' -> (None, S seconds from trace start); 'NS' -> (wall-clock ns, None)."""
+    if value.startswith("+"):
+        return None, float(value[1:])
+    return int(value), None
+
+
+def parse_filter_argv(argv):
+    """
+    Pull --tid/--from/--to/--event/--min-size/--max-size out of a CLI argv.
+    Returns (TraceFilter or None, remaining argv). --tid and --event take
+    comma-separated lists; --from/--to take wall-clock ns, or +SECONDS from
+    the first event.
+    """
+    opts, rest, i = {}, [], 0
+    names = ("--tid", "--from", "--to", "--event", "--min-size", "--max-size")
+    while i < len(argv):
+        if argv[i] in names and i + 1 < len(argv):
+            opts[argv[i]] = argv[i + 1]
+            i += 2
+        else:
+            rest.append(argv[i])
+            i += 1
+    if not opts:
+        return None, rest
+    t_start, rel_start = _parse_time(opts["--from"]) if "--from" in opts else (None, None)
+    t_end, rel_end = _parse_time(opts["--to"]) if "--to" in opts else (None, None)
+    where = TraceFilter(
+        tids=[int(t) for t in opts["--tid"].split(",")] if "--tid" in opts else None,
+        t_start=t_start, t_end=t_end, rel_start=rel_start, rel_end=rel_end,
+        events=opts["--event"].split(",") if "--event" in opts else None,
+        min_size=int(opts["--min-size"]) if "--min-size" in opts else None,
+        max_size=int(opts["--max-size"]) if "--max-size" in opts else None)
+    return where, rest
+
+
+# --- writing ---
+class BlockWriter:
+    """Write CSV rows into an mfz trace, one compressed block per N events."""
+
+    def __init__(self, path, codec=CODEC_ZLIB, block_events=DEFAULT_BLOCK_EVENTS,
+                 header_text=CSV_HEADER):
+        if not codec_available(codec):
+            print(f"[!] codec {codec} unavailable, falling back to zlib")
+            codec = CODEC_ZLIB
+        self.codec = codec
+        self.block_events = block_events
+        self._f = open(path, "wb")
+        header = header_text.encode("utf-8")
+        self._f.write(_FILE_HDR.pack(FILE_MAGIC, VERSION, codec, block_events, len(header)))
+        self._f.write(header)
+        self._rows = []
+        self._ts_min = None
+        self._ts_max = None
+        self.index = []
+
+    def write_row(self, line, ts_ns):
+        """Append one CSV row (with trailing newline) carrying timestamp ts_ns."""
+        self._rows.append(line)
+        if self._ts_min is None or ts_ns < self._ts_min:
+            self._ts_min = ts_ns
+        if self._ts_max is None or ts_ns > self._ts_max:
+            self._ts_max = ts_ns
+        if len(self._rows) >= self.block_events:
+            self.flush_block()
+
+    def flush_block(self):
+        if not self._rows:
+            return
+        raw = "".join(self._rows).encode("utf-8")
+        payload = _compress(self.codec, raw)
+        offset = self._f.tell()
+        self._f.write(_BLOCK_HDR.pack(BLOCK_MAGIC, self.codec, 0, len(self._rows), len(raw),
+                                      len(payload), self._ts_min, self._ts_max))
+        self._f.write(payload)
+        self.index.append(BlockInfo(offset, self._ts_min, self._ts_max, len(self._rows)))
+        self._rows = []
+        self._ts_min = self._ts_max = None
+
+    def close(self):
+        if self._f is None:
+            return
+        self.flush_block()
+        index_offset = self._f.tell()
+        self._f.write(struct.pack("<4sI", INDEX_MAGIC, len(self.index)))
+        for b in self.index:
+            self._f.write(_INDEX_ENTRY.pack(*b))
+        self._f.write(_TRAILER.pack(index_offset, END_MAGIC))
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compress_csv(src, dst, codec=CODEC_ZLIB, block_events=DEFAULT_BLOCK_EVENTS):
+    """Convert a CSV trace into an mfz trace. Returns the number of rows written."""
+    rows = 0
+    with open(src, "r", encoding="utf-8-sig", newline="") as f:
+        header = ""
+        while True:                            # '#' metadata lines + column names
+            line = f.readline()
+            header += line
+            if not line.startswith("#"):
+                break
+        with BlockWriter(dst, codec, block_events, header_text=header or CSV_HEADER) as w:
+            for line in f:
+                if not line.strip():
+                    continue
+                ts = line.split(",", 1)[0]
+                w.write_row(line, int(ts) if ts.isdigit() else 0)
+                rows += 1
+    return rows
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in ("info", "compress", "cat"):
+        print(__doc__.strip().split("Usage:")[1])
+        sys.exit(1)
+
+    def flag(name, default=None):
+        if name in args:
+            i = args.index(name)
+            if i + 1 < len(args):
+                return args[i + 1]
+        return default
+
+    cmd = args[0]
+    if cmd == "info" and len(args) >= 2:
+        path = args[1]
+        if not is_block_trace(path):
+            print(f"{path}: plain CSV trace ({os.path.getsize(path)} bytes)")
+            return
+        _, blocks = read_index(path)
+        events = sum(b.n_events for b in blocks)
+        print(f"{path}: mfz trace, {len(blocks)} blocks, {events} events, "
+              f"{os.path.getsize(path)} bytes")
+        if blocks:
+            print(f"  ts range: {min(b.ts_min for b in blocks)} .. {max(b.ts_max for b in blocks)}")
+    elif cmd == "compress" and len(args) >= 3:
+        codec = CODEC_NAMES.get(flag("--codec", "zlib"))
+        if codec is None:
+            print("[!] unknown codec; choose from", ", ".join(CODEC_NAMES))
+            sys.exit(1)
+        block_events = int(flag("--block-events", DEFAULT_BLOCK_EVENTS))
+        rows = compress_csv(args[1], args[2], codec, block_events)
+        print(f"[✓] Wrote {rows} events to {args[2]} "
+              f"({os.path.getsize(args[1])} -> {os.path.getsize(args[2])} bytes)")
+    elif cmd == "cat" and len(args) >= 2:
+        where, rest = parse_filter_argv(args[1:])
+        lines = iter_lines(rest[0], where)
+        hdr = next(lines)
+        if hdr.meta:
+            sys.stdout.write(META_PREFIX + " " + " ".join(f"{k}={v}" for k, v in hdr.meta.items()) + "\n")
+        sys.stdout.write(hdr.delimiter.join(hdr.fields) + "\n")
+        for line in lines:
+            sys.stdout.write(line)
+    else:
+        print(__doc__.strip().split("Usage:")[1])
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
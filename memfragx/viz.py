@@ -0,0 +1,206 @@
+"""
+viz — memory allocation heatmaps and workload impact graphs.
+
+Plots are drawn from plot-resolution aggregates (PlotBins) rather than one
+point per event. pandas and matplotlib are imported on first use so that
+importing memfragx (and running analysis-only pipelines) stays fast.
+"""
+
+import io
+import os
+
+from .binning import MAX_SIZE_BUCKET, bucket_label
+from .trace_io import iter_lines, open_trace, read_trace_header
+
+VIZ_EVENTS = ("ALLOC", "FREE", "REALLOC")
+
+
+def _pd():
+    import pandas as pd
+    return pd
+
+
+def _np():
+    import numpy as np
+    return np
+
+
+def _plt():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class PlotBins:
+    """
+    Plot-resolution aggregates: a thread x log2-size ALLOC count matrix and a
+    min/max-per-bin net-allocated series. Drawing cost depends only on these
+    arrays, never on the number of trace events.
+    """
+
+    def __init__(self, tids, heat, x, lo, hi, last):
+        self.tids = tids      # thread ids, one heatmap column each
+        self.heat = heat      # shape (len(tids), MAX_SIZE_BUCKET + 1)
+        self.x = x            # bin centre, ns offset from the first event
+        self.lo = lo
+        self.hi = hi
+        self.last = last
+
+
+def bins_from_stats(stats):
+    """Build PlotBins from the streaming aggregates kept in TraceStats (and its cache)."""
+    np = _np()
+    cells = [(*map(int, key.split(":")), n) for key, n in stats.heat.items()]
+    tids = sorted({tid for tid, _, _ in cells})
+    col = {tid: i for i, tid in enumerate(tids)}
+    heat = np.zeros((len(tids), MAX_SIZE_BUCKET + 1))
+    for tid, bucket, n in cells:
+        heat[col[tid], bucket] += n
+    pts = stats.series.points()
+    series = [np.array(c, dtype=float) for c in zip(*pts)] if pts else [np.array([])] * 4
+    return PlotBins(tids, heat, *series)
+
+
+def bins_from_frame(df, nbins=2048):
+    """Build PlotBins from a trace DataFrame with np.histogram2d and per-bin min/max."""
+    np = _np()
+    alloc = df[df['event'] == 'ALLOC']
+    tid_col = alloc['tid'].to_numpy()
+    tids = np.unique(tid_col)
+    sizes = alloc['size'].to_numpy(dtype=np.float64)
+    buckets = np.minimum(np.frexp(sizes)[1], MAX_SIZE_BUCKET)  # == int.bit_length
+    heat, _, _ = np.histogram2d(np.searchsorted(tids, tid_col), buckets,
+                                bins=[np.arange(len(tids) + 1), np.arange(MAX_SIZE_BUCKET + 2)])
+
+    ev = df[df['event'].isin(['ALLOC', 'FREE'])].sort_values('ts_ns', kind='stable')
+    delta = np.where(ev['event'].to_numpy() == 'ALLOC', 1, -1) * ev['size'].to_numpy()
+    vals = np.cumsum(delta).astype(float)
+    if vals.size == 0:
+        empty = np.array([])
+        return PlotBins(tids.tolist(), heat, empty, empty, empty, empty)
+    t = ev['ts_ns'].to_numpy() - ev['ts_ns'].min()
+    width = max(1, int(t.max()) // nbins + 1)
+    idx = t // width
+    bounds = np.flatnonzero(np.diff(idx)) + 1
+    starts = np.r_[0, bounds]
+    ends = np.r_[bounds - 1, idx.size - 1]
+    return PlotBins(tids.tolist(), heat, (idx[starts] + 0.5) * width,
+                    np.minimum.reduceat(vals, starts), np.maximum.reduceat(vals, starts),
+                    vals[ends])
+
+
+def _as_bins(data):
+    return data if isinstance(data, PlotBins) else bins_from_frame(data)
+
+
+def load_trace(path, where=None):
+    """Trace as a DataFrame; a TraceFilter `where` is applied while reading, before pandas sees a row."""
+    pd = _pd()
+    if where:
+        lines = iter_lines(path, where)
+        hdr = next(lines)
+        df = pd.read_csv(io.StringIO("".join(lines)), names=hdr.fields, sep=hdr.delimiter)
+    else:
+        with open_trace(path) as f:
+            hdr = read_trace_header(f)
+            df = pd.read_csv(f, names=hdr.fields, sep=hdr.delimiter)
+    # Normalize
+    for col in ['ts_ns', 'size', 'tid']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    if 'ts_ns' in df.columns:
+        df['ts_ns'] = hdr.clock.to_wall(df['ts_ns'].to_numpy())
+    df = df[df['event'].isin(list(VIZ_EVENTS))]
+    return df
+
+
+def plot_heatmap(data, outdir):
+    np, plt = _np(), _plt()
+    print("[+] Generating heatmap...")
+    bins = _as_bins(data)
+    if not bins.tids:
+        print("[!] No allocations to plot in heatmap")
+        return
+    # Fixed log2 size classes; keep only the rows that have any allocations
+    used = np.flatnonzero(bins.heat.sum(axis=0))
+    heat = bins.heat[:, used[0]:used[-1] + 1]
+    rows = range(used[0], used[-1] + 1)
+
+    plt.figure(figsize=(10,6))
+    plt.imshow(np.log1p(heat.T), aspect='auto', cmap='viridis', origin='lower')
+    plt.colorbar(label='log(alloc count + 1)')
+    plt.yticks(range(len(rows)), [f">={bucket_label(b)}" for b in rows], fontsize=6)
+    step = max(1, len(bins.tids) // 40)
+    plt.xticks(range(0, len(bins.tids), step), bins.tids[::step], rotation=90)
+    plt.title('Allocation Heatmap (Thread vs. Size Bucket)')
+    plt.xlabel('Thread ID')
+    plt.ylabel('Allocation Size')
+    plt.tight_layout()
+    plt.savefig(os.path.join(outdir, "heatmap_allocations.png"))
+    plt.close()
+    print("[✓] Saved heatmap ->", os.path.join(outdir, "heatmap_allocations.png"))
+
+
+def parse_smaps(path):
+    np = _np()
+    rss = []
+    if not path or not os.path.exists(path):
+        return np.array([]), np.array([])
+    with open(path) as f:
+        total = 0
+        for line in f:
+            if line.startswith("Rss:"):
+                parts = line.split()
+                if len(parts) >= 2:
+                    total += int(parts[1])
+        rss.append(total)
+    return np.arange(len(rss)), np.array(rss)
+
+
+def plot_workload_impact(data, smapsA=None, smapsB=None, outdir="results"):
+    plt = _plt()
+    print("[+] Generating workload impact graphs...")
+    # Cumulative net allocated size over time, one min/max band per time bin
+    bins = _as_bins(data)
+    mb = 1024 * 1024
+
+    plt.figure(figsize=(10,5))
+    plt.fill_between(bins.x, bins.lo / mb, bins.hi / mb, alpha=0.3, step='mid', label='Min/max per bin')
+    plt.plot(bins.x, bins.last / mb, label='Net Allocated (MB)')
+    plt.xlabel('Time (ns offset)')
+    plt.ylabel('Allocated Memory (MB)')
+    plt.title('Workload Impact — Memory Usage Over Time')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(outdir, "impact_memory_usage.png"))
+    plt.close()
+    print("[✓] Saved workload impact plot ->", os.path.join(outdir, "impact_memory_usage.png"))
+
+    # Optional RSS comparison (Approach A vs B)
+    if smapsA and smapsB:
+        xA, rssA = parse_smaps(smapsA)
+        xB, rssB = parse_smaps(smapsB)
+        if rssA.size > 0 or rssB.size > 0:
+            plt.figure(figsize=(8,5))
+            if rssA.size > 0:
+                plt.plot(xA, rssA, label="Approach A (Original)")
+            if rssB.size > 0:
+                plt.plot(xB, rssB, label="Approach B (Replay)")
+            plt.xlabel("Snapshot index")
+            plt.ylabel("RSS (KB)")
+            plt.title("RSS Comparison — Approach A vs B")
+            plt.legend()
+            plt.tight_layout()
+            plt.savefig(os.path.join(outdir, "rss_comparison.png"))
+            plt.close()
+            print("[✓] Saved RSS comparison ->", os.path.join(outdir, "rss_comparison.png"))
+
+
+def render(data, outdir, smapsA=None, smapsB=None):
+    """Draw all plots from PlotBins (or a trace DataFrame, binned first)."""
+    os.makedirs(outdir, exist_ok=True)
+    bins = _as_bins(data)
+    plot_heatmap(bins, outdir)
+    plot_workload_impact(bins, smapsA, smapsB, outdir)
+    print("[✓] All visualization metrics generated in", outdir)
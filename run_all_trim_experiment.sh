@@ -137,14 +137,11 @@ echo "  • Comparison Plot → $RESULTS/rss_comparison.png"
 echo
 
 python3 - <<'EOF'
-import csv
-path = "results/A/mftrace_log.csv"
-with open(path, newline="") as f:
-    sample = f.read(1024)
-    f.seek(0)
-    dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
-    reader = csv.DictReader(f, dialect=dialect)
-    print("Detected delimiter:", repr(dialect.delimiter))
-    print("Header fields:", reader.fieldnames)
+# read_header skips the tracer's "# mftrace ..." metadata line before the CSV header
+from memfragx.trace_io import read_header
+hdr = read_header("results/A/mftrace_log.csv")
+print("Trace metadata:", hdr.meta)
+print("Detected delimiter:", repr(hdr.delimiter))
+print("Header fields:", hdr.fields)
 EOF
 
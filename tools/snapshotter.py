@@ -4,6 +4,9 @@ import os
 import time
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from memfragx.profiling import parse_profile_argv
+
 def read_smaps(pid):
     try:
         with open(f"/proc/{pid}/smaps", "r") as f:
@@ -12,27 +15,41 @@ def read_smaps(pid):
         return None
 
 def snapshot_loop(pid, outdir, interval=1.0):
+    """Write smaps snapshots until the process exits; returns (snapshots, seconds spent capturing)."""
     os.makedirs(outdir, exist_ok=True)
     snap_id = 0
+    capture_s = 0.0
     print(f"[snapshotter] Monitoring PID {pid} every {interval}s... Press Ctrl+C to stop.")
-    while True:
-        data = read_smaps(pid)
-        if data is None:
-            print("[snapshotter] Process ended, stopping snapshots.")
-            break
-        snap_file = os.path.join(outdir, f"smap_{snap_id:04d}.txt")
-        with open(snap_file, "w") as f:
-            f.write(f"# Snapshot {snap_id} at {datetime.now()}\n")
-            f.write(data)
-        snap_id += 1
-        time.sleep(interval)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            data = read_smaps(pid)
+            if data is None:
+                print("[snapshotter] Process ended, stopping snapshots.")
+                break
+            snap_file = os.path.join(outdir, f"smap_{snap_id:04d}.txt")
+            with open(snap_file, "w") as f:
+                f.write(f"# Snapshot {snap_id} at {datetime.now()}\n")
+                f.write(data)
+            capture_s += time.perf_counter() - t0
+            snap_id += 1
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("[snapshotter] Interrupted, stopping snapshots.")
+    return snap_id, capture_s
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: snapshotter.py <pid> <output_dir> [interval_seconds]")
+    prof, argv = parse_profile_argv(sys.argv, "snapshotter")
+    if len(argv) < 3:
+        print("Usage: snapshotter.py <pid> <output_dir> [interval_seconds] [--profile] [--cprofile] [--tracemalloc]")
         sys.exit(1)
-    pid = int(sys.argv[1])
-    outdir = sys.argv[2]
-    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
-    snapshot_loop(pid, outdir, interval)
+    pid = int(argv[1])
+    outdir = argv[2]
+    interval = float(argv[3]) if len(argv) > 3 else 1.0
+    # The stage spans the whole monitoring run; capture_s is the time spent reading/writing smaps
+    with prof.stage("snapshots") as st:
+        st.items, capture_s = snapshot_loop(pid, outdir, interval)
+        st.unit = "snapshots"
+        st.extra["capture_s"] = round(capture_s, 6)
+    prof.write(outdir)
 
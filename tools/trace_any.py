@@ -6,31 +6,31 @@ and automatically generates & runs the replay (Approach B).
 """
 
 import os
+import sys
 import subprocess
 import argparse
 import time
 import shlex
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from memfragx.multiprocess import analyze_directory, find_traces, process_traces
+from memfragx.pipeline import Pipeline
+from memfragx.profiling import Profiler
+
 def run(cmd, **kwargs):
     print(f"[>] {' '.join(cmd) if isinstance(cmd, list) else cmd}")
     return subprocess.run(cmd, shell=isinstance(cmd, str), check=False, **kwargs)
 
-def main():
-    parser = argparse.ArgumentParser(description="Trace and replay any real program using MemFragX.")
-    parser.add_argument("--program", required=True, help='Program and args, e.g. "./myapp arg1 arg2"')
-    parser.add_argument("--out", default="results/run1", help="Output directory for results")
-    parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait before capturing smaps")
-    parser.add_argument("--no-replay", action="store_true", help="Skip replay phase (Approach B)")
-    args = parser.parse_args()
-
+def run_pipeline(args, prof):
     ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     tracer_path = os.path.join(ROOT, "tracer", "libmftrace.so")
-    analysis_script = os.path.join(ROOT, "analysis", "analysis.py")
-    replay_gen = os.path.join(ROOT, "tools", "replay_compact.py")
 
     os.makedirs(args.out, exist_ok=True)
-    mftrace_log = os.path.join(args.out, "mftrace_log.csv")
+    mftrace_log = os.path.join(args.out, "mftrace_log." + args.format)
     smaps_path = os.path.join(args.out, "smaps")
+    # Children of the traced program write mftrace_log.<pid>.<ext>; drop a previous run's
+    for stale in process_traces(mftrace_log):
+        os.remove(stale)
 
     # --- Step 1: Trace target program ---
     env = os.environ.copy()
@@ -41,28 +41,46 @@ def main():
     print(f"[+] Log: {mftrace_log}")
     print(f"[+] Using tracer: {tracer_path}")
 
-    proc = subprocess.Popen(shlex.split(args.program), env=env)
-    pid = proc.pid
-    print(f"[+] PID: {pid}")
-
-    # Wait a little, capture smaps mid-run
-    time.sleep(args.sleep)
-    if os.path.exists(f"/proc/{pid}/smaps"):
-        try:
-            with open(f"/proc/{pid}/smaps") as src, open(smaps_path, "w") as dst:
-                dst.write(src.read())
-            print(f"[✓] Captured smaps -> {smaps_path}")
-        except PermissionError:
-            print("[!] Permission denied reading /proc/<pid>/smaps")
-    else:
-        print("[!] Process exited before smaps capture")
-
-    proc.wait()
+    with prof.stage("trace_start"):
+        proc = subprocess.Popen(shlex.split(args.program), env=env)
+        pid = proc.pid
+        print(f"[+] PID: {pid}")
+
+        # Wait a little, capture smaps mid-run
+        time.sleep(args.sleep)
+
+    with prof.stage("smaps") as st:
+        if os.path.exists(f"/proc/{pid}/smaps"):
+            try:
+                with open(f"/proc/{pid}/smaps") as src, open(smaps_path, "w") as dst:
+                    st.items, st.unit = dst.write(src.read()), "chars"
+                print(f"[✓] Captured smaps -> {smaps_path}")
+            except PermissionError:
+                print("[!] Permission denied reading /proc/<pid>/smaps")
+        else:
+            print("[!] Process exited before smaps capture")
+
+    # The traced program's CPU time and peak RSS show up as this stage's children_*
+    with prof.stage("trace_finish") as st:
+        proc.wait()
+        if os.path.exists(mftrace_log):
+            st.items, st.unit = os.path.getsize(mftrace_log), "trace bytes"
     print(f"[✓] Program exited with code {proc.returncode}")
 
     # --- Step 2: Run analysis (Approach A) ---
+    # All post-run stages share one in-process pipeline: the trace is parsed once.
+    stages = ("analyze",) if args.no_replay else ("analyze", "replay", "viz")
+    pipe = Pipeline(mftrace_log, args.out, stages=stages)
     print("[+] Running analysis (Approach A)...")
-    run(["python3", analysis_script, mftrace_log, smaps_path])
+    with prof.stage("analyze") as st:
+        pipe.analyze(smaps_path)
+        st.items = pipe.stats.records
+    traces = find_traces(args.out, mftrace_log)
+    if len(traces) > 1:
+        # Forked/exec'd children traced too: per-process and overall totals
+        with prof.stage("analyze_processes") as st:
+            analyze_directory(args.out, summary_name="summary_processes.json", root=mftrace_log)
+            st.items, st.unit = len(traces), "traces"
 
     if args.no_replay:
         print("[✓] Done (skipped replay phase).")
@@ -71,7 +89,8 @@ def main():
     # --- Step 3: Generate replay program (Approach B) ---
     replay_c = os.path.join(args.out, "replay.c")
     print("[+] Generating replay program...")
-    run(["python3", replay_gen, mftrace_log, replay_c])
+    with prof.stage("replay_generate") as st:
+        st.items, st.unit = pipe.generate_replay(replay_c), "objects"
 
     if not os.path.exists(replay_c):
         print("[!] Replay source not created; aborting.")
@@ -80,37 +99,64 @@ def main():
     # --- Step 4: Compile and run replay ---
     replay_bin = os.path.join(args.out, "replay")
     print("[+] Compiling replay...")
-    run(["gcc", "-O2", replay_c, "-o", replay_bin])
+    with prof.stage("replay_compile"):
+        run(["gcc", "-O2", replay_c, "-o", replay_bin])
 
     if not os.path.exists(replay_bin):
         print("[!] Replay binary missing; aborting.")
         return
 
     print("[+] Running replay (Approach B)...")
-    replay_proc = subprocess.Popen([replay_bin])
-    pid_b = replay_proc.pid
-    time.sleep(2)
-
-    smaps_b = os.path.join(args.out, "smaps_replay")
-    if os.path.exists(f"/proc/{pid_b}/smaps"):
-        try:
-            with open(f"/proc/{pid_b}/smaps") as src, open(smaps_b, "w") as dst:
-                dst.write(src.read())
-            print(f"[✓] Captured smaps for replay -> {smaps_b}")
-        except PermissionError:
-            print("[!] Permission denied reading replay smaps")
-
-    replay_proc.wait()
+    with prof.stage("replay_run"):
+        replay_proc = subprocess.Popen([replay_bin])
+        pid_b = replay_proc.pid
+        time.sleep(2)
+
+        smaps_b = os.path.join(args.out, "smaps_replay")
+        if os.path.exists(f"/proc/{pid_b}/smaps"):
+            try:
+                with open(f"/proc/{pid_b}/smaps") as src, open(smaps_b, "w") as dst:
+                    dst.write(src.read())
+                print(f"[✓] Captured smaps for replay -> {smaps_b}")
+            except PermissionError:
+                print("[!] Permission denied reading replay smaps")
+
+        replay_proc.wait()
     print(f"[✓] Replay finished with code {replay_proc.returncode}")
 
     # --- Step 5: Compare results (A vs B) ---
     print("[+] Running RSS/fragmentation comparison...")
-    run(["python3", analysis_script, mftrace_log, smaps_path, smaps_b])
+    with prof.stage("compare"):
+        pipe.analyze(smaps_path)
 
     print(f"[✓] Full trace+replay pipeline complete.\nResults stored in: {args.out}")
 
-    viz_script = os.path.join(ROOT, "tools", "metrics_viz.py")
-    run(["python3", viz_script, mftrace_log, smaps_path, smaps_b])
+    try:
+        with prof.stage("viz"):
+            pipe.visualize(smaps_path, smaps_b)
+    except ImportError as e:
+        print(f"[!] Skipping visualizations: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace and replay any real program using MemFragX.")
+    parser.add_argument("--program", required=True, help='Program and args, e.g. "./myapp arg1 arg2"')
+    parser.add_argument("--out", default="results/run1", help="Output directory for results")
+    parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait before capturing smaps")
+    parser.add_argument("--no-replay", action="store_true", help="Skip replay phase (Approach B)")
+    parser.add_argument("--format", choices=["csv", "mfz"], default="csv",
+                        help="Trace format: plain CSV or block-compressed mfz")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage wall/CPU time and peak RSS in <out>/pipeline_profile.json")
+    parser.add_argument("--cprofile", action="store_true", help="Also write a cProfile dump per stage")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also record each stage's Python heap peak and top allocation sites")
+    args = parser.parse_args()
+
+    prof = Profiler("trace_any", args.profile, args.cprofile, args.tracemalloc)
+    try:
+        run_pipeline(args, prof)
+    finally:
+        prof.write(args.out)
 
 
 if __name__ == "__main__":
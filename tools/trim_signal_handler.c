@@ -1,19 +1,192 @@
 #define _GNU_SOURCE
 #include <signal.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
 #include <malloc.h>
 #include <unistd.h>
+#include <pthread.h>
+#include <semaphore.h>
+#include <errno.h>
+#include <time.h>
+
+// Preloadable malloc_trim trigger.
+//   SIGUSR1                  trim once (always installed)
+//   MFTRIM_POLICY=never      no automatic trims (default)
+//                threshold:KB   trim when RSS crosses KB; re-armed once RSS falls
+//                               below KB or grows THRESHOLD_MARGIN past the last trim
+//                periodic:MS    trim every MS milliseconds
+//                ratio:R        trim when free heap bytes / in-use heap bytes reaches R;
+//                               re-armed once it falls below R or grows THRESHOLD_MARGIN
+//                               past the ratio left by the last trim
+//   MFTRIM_INTERVAL_MS       policy poll interval (default 100)
+//   MFTRIM_LOG               CSV of every trim: ts_ns,reason,pause_ns,rss_before_kb,rss_after_kb
+//
+// All trims and log writes happen on one background thread; the signal handler
+// only sets a flag and posts a semaphore (both async-signal-safe).
+
+enum policy { POLICY_NEVER, POLICY_THRESHOLD, POLICY_PERIODIC, POLICY_RATIO };
+
+static enum policy policy = POLICY_NEVER;
+static double policy_arg;
+static long interval_ms = 100;
+static FILE *trim_log;
+static volatile sig_atomic_t trim_requested;
+static sem_t wakeup;
+
+#define THRESHOLD_MARGIN 0.25
+
+static long long now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec;
+}
+
+static long rss_kb(void) {
+    long pages = 0, resident = 0;
+    FILE *f = fopen("/proc/self/statm", "r");
+    if (!f) return 0;
+    if (fscanf(f, "%ld %ld", &pages, &resident) != 2) resident = 0;
+    fclose(f);
+    return resident * (sysconf(_SC_PAGESIZE) / 1024);
+}
+
+static double free_ratio(void) {
+#if defined(__GLIBC__) && (__GLIBC__ > 2 || (__GLIBC__ == 2 && __GLIBC_MINOR__ >= 33))
+    struct mallinfo2 mi = mallinfo2();
+#else
+    struct mallinfo mi = mallinfo();
+#endif
+    return mi.uordblks ? (double)mi.fordblks / (double)mi.uordblks : 0.0;
+}
+
+static void do_trim(const char *reason) {
+    long before = trim_log ? rss_kb() : 0;
+    long long t0 = now_ns();
+    malloc_trim(0);
+    long long pause = now_ns() - t0;
+    if (!trim_log) return;
+    long after = rss_kb();
+    fprintf(trim_log, "%lld,%s,%lld,%ld,%ld\n", t0, reason, pause, before, after);
+    fflush(trim_log);
+}
 
 static void handle_trim(int signum) {
     (void)signum;
-    malloc_trim(0);
-    fprintf(stderr, "malloc_trim(0) invoked via signal\n");
+    trim_requested = 1;
+    sem_post(&wakeup);
+}
+
+// wait up to interval_ms (forever with no policy); returns 1 on timeout, 0 when woken
+static int wait_tick(void) {
+    if (policy == POLICY_NEVER) {
+        while (sem_wait(&wakeup) != 0 && errno == EINTR) ;
+        return 0;
+    }
+    struct timespec deadline;
+    clock_gettime(CLOCK_REALTIME, &deadline);
+    deadline.tv_sec += interval_ms / 1000;
+    deadline.tv_nsec += (interval_ms % 1000) * 1000000L;
+    if (deadline.tv_nsec >= 1000000000L) { deadline.tv_sec++; deadline.tv_nsec -= 1000000000L; }
+    for (;;) {
+        if (sem_timedwait(&wakeup, &deadline) == 0) return 0;
+        if (errno == ETIMEDOUT) return 1;
+    }
+}
+
+static void *policy_loop(void *arg) {
+    (void)arg;
+    long long last = now_ns();
+    int armed = 1;                            // threshold/ratio: trim on the next crossing
+    double rearm_at = 0;                      // threshold/ratio: also re-arm above this value
+    for (;;) {
+        int timed_out = wait_tick();
+        if (trim_requested) {
+            trim_requested = 0;
+            do_trim("signal");
+            fprintf(stderr, "malloc_trim(0) invoked via signal\n");
+        }
+        if (!timed_out) continue;
+        switch (policy) {
+        case POLICY_THRESHOLD: {
+            long rss = rss_kb();
+            if (!armed && (rss <= (long)policy_arg || rss > rearm_at)) armed = 1;
+            if (armed && rss > (long)policy_arg) {
+                do_trim("threshold");
+                armed = 0;
+                rearm_at = rss_kb() * (1.0 + THRESHOLD_MARGIN);
+            }
+            break;
+        }
+        case POLICY_PERIODIC:
+            if (now_ns() - last >= (long long)(policy_arg * 1e6)) {
+                last = now_ns();
+                do_trim("periodic");
+            }
+            break;
+        case POLICY_RATIO: {
+            // trimming only returns top/whole free pages, so fragmented free chunks can
+            // keep the ratio above R; trim once per crossing instead of every tick
+            double ratio = free_ratio();
+            if (!armed && (ratio < policy_arg || ratio > rearm_at)) armed = 1;
+            if (armed && ratio >= policy_arg) {
+                do_trim("ratio");
+                armed = 0;
+                rearm_at = free_ratio() * (1.0 + THRESHOLD_MARGIN);
+            }
+            break;
+        }
+        default:
+            break;
+        }
+    }
+    return NULL;
+}
+
+static void load_policy(void) {
+    const char *spec = getenv("MFTRIM_POLICY");
+    const char *iv = getenv("MFTRIM_INTERVAL_MS");
+    if (iv && atol(iv) > 0) interval_ms = atol(iv);
+    if (!spec || strcmp(spec, "never") == 0) return;
+    if (sscanf(spec, "threshold:%lf", &policy_arg) == 1) policy = POLICY_THRESHOLD;
+    else if (sscanf(spec, "periodic:%lf", &policy_arg) == 1) policy = POLICY_PERIODIC;
+    else if (sscanf(spec, "ratio:%lf", &policy_arg) == 1) policy = POLICY_RATIO;
+    else fprintf(stderr, "[mftrim] unknown MFTRIM_POLICY %s; not trimming\n", spec);
+    // periodic trims need a poll no coarser than their period
+    if (policy == POLICY_PERIODIC && policy_arg > 0 && policy_arg < interval_ms)
+        interval_ms = (long)policy_arg;
+}
+
+static void start_trim_thread(void) {
+    pthread_t th;
+    pthread_attr_t attr;
+    pthread_attr_init(&attr);
+    pthread_attr_setdetachstate(&attr, PTHREAD_CREATE_DETACHED);
+    if (pthread_create(&th, &attr, policy_loop, NULL) != 0)
+        fprintf(stderr, "[mftrim] cannot start trim thread\n");
+    pthread_attr_destroy(&attr);
+}
+
+// threads do not survive fork(): give the child its own trim thread (fresh policy state)
+static void atfork_child(void) {
+    trim_requested = 0;
+    sem_init(&wakeup, 0, 0);
+    start_trim_thread();
 }
 
 __attribute__((constructor)) static void install() {
+    sem_init(&wakeup, 0, 0);                  // before the handler can post it
     struct sigaction sa;
     sa.sa_handler = handle_trim;
     sigemptyset(&sa.sa_mask);
     sa.sa_flags = SA_RESTART;
     sigaction(SIGUSR1, &sa, NULL);
+
+    const char *log_path = getenv("MFTRIM_LOG");
+    if (log_path && (trim_log = fopen(log_path, "w")) != NULL)
+        fputs("ts_ns,reason,pause_ns,rss_before_kb,rss_after_kb\n", trim_log);
+
+    load_policy();
+    start_trim_thread();
+    pthread_atfork(NULL, NULL, atfork_child);
 }
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+trim_sweep.py — sweep malloc_trim policies across workload patterns and sizes
+
+Every (pattern, max_size, policy) combination runs workload/workload under
+tools/trim_handler.so with MFTRIM_POLICY set, in its own output directory and
+in parallel across cores. Each run records:
+
+  rss.csv       RSS timeline sampled from /proc/<pid>/status
+  trim_log.csv  every malloc_trim call: reason, pause, RSS before/after
+
+and the sweep writes one results table (sweep_results.csv / .json) with
+throughput, peak/mean/final RSS and trim pauses per run, plus sweep_rss.png
+(RSS timelines, one panel per workload) and sweep_tradeoff.png (mean RSS vs
+throughput per policy).
+
+Policies: never | threshold:KB | periodic:MS | ratio:R (see trim_signal_handler.c)
+
+Usage:
+  python3 tools/trim_sweep.py [--patterns uniform,burst,pareto] [--sizes 4096,65536]
+                              [--policies never,threshold:65536,periodic:500,ratio:0.5]
+                              [--ops 2000000] [--jobs N] [--out results/trim_sweep]
+                              [--workload-args "--threads 4 --lifetime bimodal:64:50000:0.1"]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_POLICIES = "never,threshold:65536,periodic:500,ratio:0.5"
+# what trim_signal_handler.c accepts; anything else would silently run as "never"
+POLICY_RE = re.compile(r"(never|(threshold|periodic|ratio):\d+(\.\d*)?)$")
+RESULT_FIELDS = ("pattern", "max_size", "policy", "returncode", "wall_s", "ops_per_s", "peak_rss_kb",
+                 "mean_rss_kb", "final_rss_kb", "trims", "trim_pause_total_ms",
+                 "trim_pause_max_ms", "trim_released_kb")
+
+
+def build_workload(out):
+    src = os.path.join(ROOT, "workload", "workload.c")
+    binary = os.path.join(out, "workload")
+    subprocess.run(["gcc", "-O2", src, "-o", binary, "-pthread", "-lm"], check=True)
+    return binary
+
+
+def parse_policies(spec):
+    policies = [p.strip() for p in spec.split(",") if p.strip()]
+    bad = [p for p in policies if not POLICY_RE.match(p)]
+    if bad:
+        raise ValueError(f"unknown trim policies {bad}; expected never, threshold:KB, "
+                         f"periodic:MS or ratio:R")
+    return policies
+
+
+def read_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return None
+
+
+def read_trim_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        return [{k: (v if k == "reason" else int(v)) for k, v in row.items()}
+                for row in csv.DictReader(f)]
+
+
+def run_one(job):
+    """Run one workload/policy combination, sampling RSS until it exits."""
+    run_dir = job["dir"]
+    os.makedirs(run_dir, exist_ok=True)
+    env = os.environ.copy()
+    env.update(LD_PRELOAD=job["handler"], MFTRIM_POLICY=job["policy"],
+               MFTRIM_LOG=os.path.join(run_dir, "trim_log.csv"))
+    cmd = [job["workload"], job["pattern"], str(job["ops"]), str(job["max_size"])] + job["extra"]
+
+    timeline = []
+    with open(os.path.join(run_dir, "workload.err"), "w") as err:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=err)
+        while proc.poll() is None:
+            rss = read_rss_kb(proc.pid)
+            if rss is not None:
+                timeline.append((time.perf_counter() - t0, rss))
+            time.sleep(job["interval"])
+        wall = time.perf_counter() - t0
+
+    with open(os.path.join(run_dir, "rss.csv"), "w") as f:
+        f.write("t_s,rss_kb\n")
+        for t, rss in timeline:
+            f.write(f"{t:.4f},{rss}\n")
+
+    trims = read_trim_log(os.path.join(run_dir, "trim_log.csv"))
+    pauses = [t["pause_ns"] for t in trims]
+    rss = [r for _, r in timeline] or [0]
+    return {
+        "pattern": job["pattern"],
+        "max_size": job["max_size"],
+        "policy": job["policy"],
+        "returncode": proc.returncode,
+        "wall_s": wall,
+        "ops_per_s": job["ops"] / wall,
+        "peak_rss_kb": max(rss),
+        "mean_rss_kb": sum(rss) / len(rss),
+        "final_rss_kb": rss[-1],
+        "trims": len(trims),
+        "trim_pause_total_ms": sum(pauses) / 1e6,
+        "trim_pause_max_ms": max(pauses, default=0) / 1e6,
+        "trim_released_kb": sum(max(0, t["rss_before_kb"] - t["rss_after_kb"]) for t in trims),
+        "timeline": timeline,
+        "dir": run_dir,
+    }
+
+
+def write_table(results, out):
+    csv_path = os.path.join(out, "sweep_results.csv")
+    with open(csv_path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(results)
+    json_path = os.path.join(out, "sweep_results.json")
+    with open(json_path, "w") as f:
+        json.dump([{k: v for k, v in r.items() if k != "timeline"} for r in results], f, indent=4)
+    print(f"[✓] Results table saved to {csv_path}")
+
+
+def print_table(results):
+    print(f"\n{'workload':>16s} {'policy':>18s} {'Mops/s':>8s} {'peak MB':>8s} {'mean MB':>8s} "
+          f"{'trims':>6s} {'pause ms':>9s} {'max ms':>7s}")
+    for r in results:
+        name = f"{r['pattern']}/{r['max_size']}"
+        print(f"{name:>16s} {r['policy']:>18s} {r['ops_per_s'] / 1e6:8.3f} "
+              f"{r['peak_rss_kb'] / 1024:8.1f} {r['mean_rss_kb'] / 1024:8.1f} {r['trims']:6d} "
+              f"{r['trim_pause_total_ms']:9.2f} {r['trim_pause_max_ms']:7.2f}"
+              + ("" if r["returncode"] == 0 else f"  FAILED (exit {r['returncode']})"))
+
+
+def plot(results, out):
+    """Charts of the successful runs only: a crashed run's RSS and throughput mean nothing."""
+    results = [r for r in results if r["returncode"] == 0]
+    if not results:
+        print("[!] No successful runs to plot")
+        return
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    workloads = sorted({(r["pattern"], r["max_size"]) for r in results})
+    cols = min(3, len(workloads))
+    rows = (len(workloads) + cols - 1) // cols
+    fig, axes = plt.subplots(rows, cols, figsize=(5 * cols, 3.5 * rows), squeeze=False)
+    for ax, (pattern, size) in zip(axes.flat, workloads):
+        for r in results:
+            if (r["pattern"], r["max_size"]) == (pattern, size) and r["timeline"]:
+                t, rss = zip(*r["timeline"])
+                ax.plot(t, [v / 1024 for v in rss], label=r["policy"])
+        ax.set_title(f"{pattern}, max {size} B")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("RSS (MB)")
+        ax.legend(fontsize=7)
+    for ax in list(axes.flat)[len(workloads):]:
+        ax.axis("off")
+    fig.tight_layout()
+    rss_png = os.path.join(out, "sweep_rss.png")
+    fig.savefig(rss_png)
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    for policy in sorted({r["policy"] for r in results}):
+        sel = [r for r in results if r["policy"] == policy]
+        ax.scatter([r["ops_per_s"] / 1e6 for r in sel], [r["mean_rss_kb"] / 1024 for r in sel],
+                   label=policy)
+    ax.set_xlabel("Throughput (M ops/s)")
+    ax.set_ylabel("Mean RSS (MB)")
+    ax.set_title("Trim policy trade-off (each point is one workload)")
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    tradeoff_png = os.path.join(out, "sweep_tradeoff.png")
+    fig.savefig(tradeoff_png)
+    plt.close(fig)
+    print(f"[✓] Charts saved to {rss_png} and {tradeoff_png}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep malloc_trim policies across workloads.")
+    parser.add_argument("--patterns", default="uniform,burst,pareto")
+    parser.add_argument("--sizes", default="4096,65536", help="comma-separated workload max sizes")
+    parser.add_argument("--policies", default=DEFAULT_POLICIES)
+    parser.add_argument("--ops", type=int, default=2000000)
+    parser.add_argument("--workload-args", default="", help="extra workload options, e.g. \"--threads 4\"")
+    parser.add_argument("--interval", type=float, default=0.05, help="RSS sampling interval (s)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="runs in parallel")
+    parser.add_argument("--out", default=os.path.join(ROOT, "results", "trim_sweep"))
+    args = parser.parse_args()
+
+    try:
+        policies = parse_policies(args.policies)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    handler = os.path.join(ROOT, "tools", "trim_handler.so")
+    if not os.path.exists(handler):
+        print(f"[!] {handler} missing; run `make trim_handler` first")
+        sys.exit(1)
+    os.makedirs(args.out, exist_ok=True)
+    workload = build_workload(args.out)
+
+    jobs = []
+    for pattern in args.patterns.split(","):
+        for size in (int(s) for s in args.sizes.split(",")):
+            for policy in policies:
+                name = f"{pattern}-{size}-{policy.replace(':', '_')}"
+                jobs.append({"pattern": pattern, "max_size": size, "policy": policy,
+                             "ops": args.ops, "extra": shlex.split(args.workload_args),
+                             "workload": workload, "handler": handler,
+                             "interval": args.interval, "dir": os.path.join(args.out, name)})
+    print(f"[+] Running {len(jobs)} runs, {args.jobs} at a time -> {args.out}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for r in pool.map(run_one, jobs):
+            status = "[✓]" if r["returncode"] == 0 else "[!]"
+            print(f"{status} {r['pattern']}/{r['max_size']} {r['policy']}: {r['wall_s']:.2f}s, "
+                  f"{r['trims']} trims")
+            results.append(r)
+
+    print_table(results)
+    write_table(results, args.out)
+    failed = sum(r["returncode"] != 0 for r in results)
+    if failed:
+        print(f"[!] {failed} run(s) failed; see workload.err in their directories "
+              f"(kept in the table with their returncode, left out of the charts)")
+    try:
+        plot(results, args.out)
+    except ImportError as e:
+        print(f"[!] Skipping charts: {e}")
+
+
+if __name__ == "__main__":
+    main()
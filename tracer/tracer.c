@@ -1,44 +1,501 @@
 #define _GNU_SOURCE
 #include <stdio.h>
 #include <stdlib.h>
+#include <stdarg.h>
 #include <dlfcn.h>
 #include <pthread.h>
 #include <unistd.h>
 #include <string.h>
 #include <time.h>
+#include <stdint.h>
 #include <sys/syscall.h>
+#include <fcntl.h>
+#include <limits.h>
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#define HAVE_TSC 1
+#endif
+#ifdef MFTRACE_WITH_ZLIB
+#include <zlib.h>
+#endif
+#ifdef MFTRACE_WITH_ZSTD
+#include <zstd.h>
+#endif
 
 static FILE *log_file = NULL;
 static pthread_mutex_t lock = PTHREAD_MUTEX_INITIALIZER;
 static int initialized = 0;
-static int in_hook = 0;
+
+/* Per-thread reentrancy guards: a hook running on one thread must not make
+ * other threads skip logging. initial-exec TLS never allocates. */
+#define MF_TLS __thread __attribute__((tls_model("initial-exec")))
+static MF_TLS int in_hook = 0;
+static MF_TLS int resolving = 0;   // inside dlsym() looking up the real allocator
+
+/* Logger state: events before init_logger() are parked in a pre-init buffer. */
+enum { LOG_PENDING, LOG_READY, LOG_FAILED, LOG_CLOSED };
+static int log_state = LOG_PENDING;
+static unsigned long dropped = 0;   // events that could not be recorded
 
 static void* (*real_malloc)(size_t) = NULL;
 static void  (*real_free)(void*)   = NULL;
 static void* (*real_calloc)(size_t,size_t) = NULL;
 static void* (*real_realloc)(void*,size_t) = NULL;
 
-static inline pid_t gettid_wrapper(void) { return (pid_t)syscall(SYS_gettid); }
-static inline long long get_time_ns(void) {
-    struct timespec ts; clock_gettime(CLOCK_REALTIME, &ts);
+/* ---- bootstrap arena: serves allocations dlsym() makes before the real allocator is known ---- */
+#define BOOT_ARENA_SIZE (64 * 1024)
+static char boot_arena[BOOT_ARENA_SIZE] __attribute__((aligned(16)));
+static size_t boot_used = 0;
+
+static void *boot_alloc(size_t size) {
+    size_t need = 16 + ((size + 15) & ~(size_t)15);   // 16-byte size header keeps alignment
+    size_t off = __atomic_fetch_add(&boot_used, need, __ATOMIC_RELAXED);
+    if (off + need > BOOT_ARENA_SIZE) return NULL;
+    *(size_t *)(boot_arena + off) = size;
+    return boot_arena + off + 16;                      // static storage: already zeroed
+}
+
+static inline int is_boot_ptr(const void *p) {
+    return (const char *)p >= boot_arena && (const char *)p < boot_arena + BOOT_ARENA_SIZE;
+}
+
+static void resolve_real(void) {
+    if (real_malloc && real_free && real_calloc && real_realloc) return;
+    resolving = 1;
+    void *m = dlsym(RTLD_NEXT, "malloc");
+    void *f = dlsym(RTLD_NEXT, "free");
+    void *c = dlsym(RTLD_NEXT, "calloc");
+    void *r = dlsym(RTLD_NEXT, "realloc");
+    __atomic_store_n(&real_malloc, m, __ATOMIC_RELEASE);
+    __atomic_store_n(&real_free, f, __ATOMIC_RELEASE);
+    __atomic_store_n(&real_calloc, c, __ATOMIC_RELEASE);
+    __atomic_store_n(&real_realloc, r, __ATOMIC_RELEASE);
+    resolving = 0;
+}
+
+/* ---- thread id: one gettid syscall per thread, not per event ---- */
+static MF_TLS pid_t cached_tid = 0;
+
+static inline pid_t gettid_wrapper(void) {
+    if (!cached_tid) cached_tid = (pid_t)syscall(SYS_gettid);
+    return cached_tid;
+}
+
+/* ---- clock source (MFTRACE_CLOCK) ----
+ * realtime (default) | monotonic | monotonic-coarse | tsc.
+ * Non-realtime timestamps are raw clock units; the trace header records
+ * base_wall_ns/base_ts/ticks_per_sec so readers can map them to wall time. */
+enum { CLK_REALTIME, CLK_MONOTONIC, CLK_MONOTONIC_COARSE, CLK_TSC };
+static const char *const clock_names[] = { "realtime", "monotonic", "monotonic-coarse", "tsc" };
+static int clock_src = CLK_REALTIME;
+static long long base_wall_ns = 0, base_ts = 0;
+static double ticks_per_sec = 1e9;
+
+static inline long long clock_ns(clockid_t id) {
+    struct timespec ts; clock_gettime(id, &ts);
     return ((long long)ts.tv_sec * 1000000000LL) + ts.tv_nsec;
 }
 
+static inline long long get_timestamp(void) {
+    switch (clock_src) {
+    case CLK_MONOTONIC:        return clock_ns(CLOCK_MONOTONIC);
+    case CLK_MONOTONIC_COARSE: return clock_ns(CLOCK_MONOTONIC_COARSE);
+#ifdef HAVE_TSC
+    case CLK_TSC:              return (long long)__rdtsc();
+#endif
+    default:                   return clock_ns(CLOCK_REALTIME);
+    }
+}
+
+static void init_clock(void) {
+    const char *name = getenv("MFTRACE_CLOCK");
+    if (name) {
+        int found = 0;
+        for (int i = 0; i < 4; i++)
+            if (strcmp(name, clock_names[i]) == 0) { clock_src = i; found = 1; }
+        if (!found)
+            fprintf(stderr, "[mftrace] unknown MFTRACE_CLOCK '%s' (valid: realtime, monotonic, "
+                            "monotonic-coarse, tsc), using realtime\n", name);
+    }
+#ifndef HAVE_TSC
+    if (clock_src == CLK_TSC) {
+        fprintf(stderr, "[mftrace] tsc clock unavailable on this CPU, using monotonic\n");
+        clock_src = CLK_MONOTONIC;
+    }
+#else
+    if (clock_src == CLK_TSC) {               // calibrate once against CLOCK_MONOTONIC
+        long long m0 = clock_ns(CLOCK_MONOTONIC);
+        unsigned long long t0 = __rdtsc();
+        struct timespec pause = { 0, 20 * 1000 * 1000 };
+        nanosleep(&pause, NULL);
+        long long m1 = clock_ns(CLOCK_MONOTONIC);
+        unsigned long long t1 = __rdtsc();
+        if (m1 > m0 && t1 > t0) ticks_per_sec = (double)(t1 - t0) * 1e9 / (double)(m1 - m0);
+    }
+#endif
+    base_wall_ns = clock_ns(CLOCK_REALTIME);
+    base_ts = get_timestamp();
+}
+
+/* ---- trace header: clock metadata line + column names ---- */
+#define CSV_HEADER "ts_ns,event,ptr,size,tid\n"
+static char header_text[256];
+
+static void format_header(void) {
+    snprintf(header_text, sizeof(header_text),
+             "# mftrace clock=%s base_wall_ns=%lld base_ts=%lld ticks_per_sec=%.0f pid=%d\n" CSV_HEADER,
+             clock_names[clock_src], base_wall_ns, base_ts, ticks_per_sec, (int)getpid());
+}
+
+/* ---- block-compressed output (.mfz, format documented in memfragx/trace_io.py) ---- */
+#define MFZ_VERSION 1
+#define CODEC_RAW  0
+#define CODEC_ZLIB 1
+#define CODEC_ZSTD 2
+#define MAX_LINE   96
+
+static int block_mode = 0;
+static int block_codec = CODEC_RAW;
+static unsigned block_events = 65536;
+
+/* Double buffering: threads append rows to blk_buf under `lock`. A full block is
+ * swapped with blk_spare and compressed/written by the thread that filled it
+ * after it drops `lock`, holding only `flush_lock`, so other threads keep
+ * tracing meanwhile. Lock order: lock -> flush_lock. */
+static pthread_mutex_t flush_lock = PTHREAD_MUTEX_INITIALIZER;
+static MF_TLS int owes_write = 0;       // this thread holds flush_lock for a handed-off block
+
+static char *blk_buf = NULL;            // CSV rows of the current block (under lock)
+static size_t blk_len = 0, blk_cap = 0;
+static unsigned blk_n = 0;
+static long long blk_min = 0, blk_max = 0;
+static char *blk_spare = NULL;          // block being written (under flush_lock)
+static size_t pend_len = 0;
+static unsigned pend_n = 0;
+static long long pend_min = 0, pend_max = 0;
+static unsigned char *blk_out = NULL;   // compression scratch (under flush_lock)
+static size_t blk_out_cap = 0;
+static uint64_t blk_file_off = 0;       // current end of file (under flush_lock)
+
+struct blk_entry { uint64_t offset; int64_t ts_min, ts_max; uint32_t n; };
+static struct blk_entry *blk_idx = NULL;
+static size_t blk_idx_n = 0, blk_idx_cap = 0;
+
+static const char *trace_path(void) {
+    const char *path = getenv("MFTRACE_LOG");
+    return path ? path : "results/mftrace_log.csv";
+}
+
+static void load_config(void) {
+    const char *path = trace_path();
+    const char *fmt = getenv("MFTRACE_FORMAT");
+    size_t n = strlen(path);
+    if (fmt) block_mode = (strcmp(fmt, "mfz") == 0);
+    else block_mode = (n > 4 && strcmp(path + n - 4, ".mfz") == 0);
+
+    const char *be = getenv("MFTRACE_BLOCK_EVENTS");
+    if (be && atol(be) > 0) block_events = (unsigned)atol(be);
+
+    const char *codec = getenv("MFTRACE_CODEC");
+#ifdef MFTRACE_WITH_ZLIB
+    block_codec = CODEC_ZLIB;
+#endif
+#ifdef MFTRACE_WITH_ZSTD
+    if (codec && strcmp(codec, "zstd") == 0) block_codec = CODEC_ZSTD;
+#endif
+    if (codec && strcmp(codec, "raw") == 0) block_codec = CODEC_RAW;
+}
+
+static void put_le(unsigned char *p, uint64_t v, int nbytes) {
+    for (int i = 0; i < nbytes; i++) p[i] = (unsigned char)(v >> (8 * i));
+}
+
+static void write_mfz_header(FILE *f) {
+    unsigned char hdr[16];
+    memcpy(hdr, "MFZ1", 4);
+    put_le(hdr + 4, MFZ_VERSION, 2);
+    put_le(hdr + 6, (uint64_t)block_codec, 2);
+    put_le(hdr + 8, block_events, 4);
+    put_le(hdr + 12, strlen(header_text), 4);
+    fwrite(hdr, 1, sizeof(hdr), f);
+    fputs(header_text, f);
+}
+
+static int block_alloc(void) {
+    blk_cap = (size_t)block_events * MAX_LINE;
+    blk_buf = real_malloc(blk_cap);
+    blk_spare = real_malloc(blk_cap);
+#ifdef MFTRACE_WITH_ZLIB
+    blk_out_cap = compressBound(blk_cap);
+#endif
+#ifdef MFTRACE_WITH_ZSTD
+    if (ZSTD_compressBound(blk_cap) > blk_out_cap) blk_out_cap = ZSTD_compressBound(blk_cap);
+#endif
+    if (blk_out_cap) blk_out = real_malloc(blk_out_cap);
+    return blk_buf && blk_spare && (blk_out || !blk_out_cap);
+}
+
+// move the filled block to the spare buffer; caller holds `lock`, returns holding flush_lock
+static void block_handoff(void) {
+    pthread_mutex_lock(&flush_lock);          // waits only if the previous block is still being written
+    char *full = blk_buf;
+    blk_buf = blk_spare;
+    blk_spare = full;
+    pend_len = blk_len; pend_n = blk_n; pend_min = blk_min; pend_max = blk_max;
+    blk_len = 0; blk_n = 0;
+}
+
+// compress and write the handed-off block; caller holds flush_lock (and usually not `lock`)
+static void block_write(void) {
+    if (!pend_n || !log_file) return;
+    const unsigned char *payload = (const unsigned char *)blk_spare;
+    size_t comp_len = pend_len;
+    int codec = block_codec;
+    // level 1: most of the ratio of the default level at a fraction of the CPU
+#ifdef MFTRACE_WITH_ZLIB
+    if (codec == CODEC_ZLIB) {
+        uLongf out_len = blk_out_cap;
+        if (compress2(blk_out, &out_len, (const Bytef *)blk_spare, pend_len, 1) == Z_OK) {
+            payload = blk_out; comp_len = out_len;
+        } else codec = CODEC_RAW;
+    }
+#endif
+#ifdef MFTRACE_WITH_ZSTD
+    if (codec == CODEC_ZSTD) {
+        size_t r = ZSTD_compress(blk_out, blk_out_cap, blk_spare, pend_len, 1);
+        if (!ZSTD_isError(r)) { payload = blk_out; comp_len = r; }
+        else codec = CODEC_RAW;
+    }
+#endif
+    unsigned char hdr[36];
+    memcpy(hdr, "MFB1", 4);
+    put_le(hdr + 4, (uint64_t)codec, 2);
+    put_le(hdr + 6, 0, 2);
+    put_le(hdr + 8, pend_n, 4);
+    put_le(hdr + 12, pend_len, 4);
+    put_le(hdr + 16, comp_len, 4);
+    put_le(hdr + 20, (uint64_t)pend_min, 8);
+    put_le(hdr + 28, (uint64_t)pend_max, 8);
+    fwrite(hdr, 1, sizeof(hdr), log_file);
+    fwrite(payload, 1, comp_len, log_file);
+
+    if (blk_idx_n == blk_idx_cap) {
+        size_t cap = blk_idx_cap ? blk_idx_cap * 2 : 64;
+        struct blk_entry *p = real_realloc(blk_idx, cap * sizeof(*p));
+        if (p) { blk_idx = p; blk_idx_cap = cap; }
+    }
+    if (blk_idx_n < blk_idx_cap)
+        blk_idx[blk_idx_n++] = (struct blk_entry){ blk_file_off, pend_min, pend_max, pend_n };
+    blk_file_off += sizeof(hdr) + comp_len;
+    pend_n = 0;
+}
+
+// write the current block synchronously; caller holds `lock`
+static void block_flush(void) {
+    if (!blk_n || !log_file) return;
+    block_handoff();
+    block_write();
+    pthread_mutex_unlock(&flush_lock);
+}
+
+// finish a block handed off while `lock` was held; call after dropping `lock`
+static void block_write_owed(void) {
+    if (!owes_write) return;
+    owes_write = 0;
+    block_write();
+    pthread_mutex_unlock(&flush_lock);
+}
+
+static void block_append(long long ts, const char *event, void *ptr,
+                         size_t size, int has_size, pid_t tid) {
+    if (!blk_buf) return;
+    if (blk_cap - blk_len < MAX_LINE) {
+        block_write_owed();
+        block_flush();
+    }
+    int n = has_size
+        ? snprintf(blk_buf + blk_len, MAX_LINE, "%lld,%s,%p,%zu,%d\n", ts, event, ptr, size, tid)
+        : snprintf(blk_buf + blk_len, MAX_LINE, "%lld,%s,%p,,%d\n", ts, event, ptr, tid);
+    if (n <= 0 || n >= MAX_LINE) return;
+    if (!blk_n || ts < blk_min) blk_min = ts;
+    if (!blk_n || ts > blk_max) blk_max = ts;
+    blk_len += (size_t)n;
+    if (++blk_n >= block_events) {
+        block_write_owed();                   // earlier hand-off still unwritten (preinit replay)
+        block_handoff();
+        owes_write = 1;                       // written by block_write_owed() outside `lock`
+    }
+}
+
+// footer index lets readers seek straight to a block; caller holds `lock`
+static void block_finish(void) {
+    block_flush();
+    if (!log_file) return;
+    pthread_mutex_lock(&flush_lock);
+    unsigned char buf[28];
+    uint64_t index_off = blk_file_off;
+    memcpy(buf, "MFI1", 4);
+    put_le(buf + 4, blk_idx_n, 4);
+    fwrite(buf, 1, 8, log_file);
+    for (size_t i = 0; i < blk_idx_n; i++) {
+        put_le(buf, blk_idx[i].offset, 8);
+        put_le(buf + 8, (uint64_t)blk_idx[i].ts_min, 8);
+        put_le(buf + 16, (uint64_t)blk_idx[i].ts_max, 8);
+        put_le(buf + 24, blk_idx[i].n, 4);
+        fwrite(buf, 1, 28, log_file);
+    }
+    put_le(buf, index_off, 8);
+    memcpy(buf + 8, "MFZE", 4);
+    fwrite(buf, 1, 12, log_file);
+    fflush(log_file);
+    pthread_mutex_unlock(&flush_lock);
+}
+
+/* ---- pre-init buffer: events recorded before the log file is open ---- */
+#define PREINIT_EVENTS 8192
+struct pending_event {
+    long long ts;
+    const char *event;
+    void *ptr;
+    size_t size;
+    int has_size;
+    pid_t tid;
+};
+static struct pending_event preinit_buf[PREINIT_EVENTS];
+static unsigned preinit_n = 0;
+
+// caller holds `lock`
+static void write_event(long long ts, const char *event, void *ptr,
+                        size_t size, int has_size, pid_t tid) {
+    if (block_mode)
+        block_append(ts, event, ptr, size, has_size, tid);
+    else if (has_size)
+        fprintf(log_file, "%lld,%s,%p,%zu,%d\n", ts, event, ptr, size, tid);
+    else
+        fprintf(log_file, "%lld,%s,%p,,%d\n", ts, event, ptr, tid);
+}
+
+/* ---- per-process trace files ----
+ * The first traced process writes MFTRACE_LOG and exports MFTRACE_ROOT_PID.
+ * Forked children and exec'd descendants (which inherit LD_PRELOAD) each get a
+ * fresh "<stem>.<pid><ext>" file next to it instead of clobbering the root's. */
+static char log_path[PATH_MAX];
+
+// create "<stem>.<pid>[-n]<ext>" exclusively; returns an open fd or -1
+static int create_process_trace(void) {
+    const char *base = trace_path();
+    const char *slash = strrchr(base, '/');
+    const char *dot = strrchr(base, '.');
+    if (!dot || (slash && dot < slash)) dot = base + strlen(base);
+    int stem = (int)(dot - base);
+    for (int n = 0; n < 1000; n++) {
+        if (n == 0)
+            snprintf(log_path, sizeof(log_path), "%.*s.%d%s", stem, base, (int)getpid(), dot);
+        else
+            snprintf(log_path, sizeof(log_path), "%.*s.%d-%d%s", stem, base, (int)getpid(), n, dot);
+        int fd = open(log_path, O_WRONLY | O_CREAT | O_EXCL, 0644);
+        if (fd >= 0) return fd;
+    }
+    return -1;
+}
+
+static void write_trace_header(FILE *f) {
+    if (block_mode) write_mfz_header(f);
+    else fputs(header_text, f);
+    fflush(f);
+}
+
 /* ---- guaranteed early header write ---- */
 __attribute__((constructor(101)))   // low priority -> runs first
 static void preinit_logger(void) {
-    const char *path = getenv("MFTRACE_LOG");
-    if (!path) path = "results/mftrace_log.csv";
+    in_hook = 1;                              // tracer's own allocations are not traced
+    resolve_real();
+    load_config();
+    init_clock();
+    format_header();
 
-    FILE *tmp = fopen(path, "w");             // always truncate + new header
+    FILE *tmp = NULL;
+    if (!getenv("MFTRACE_ROOT_PID")) {
+        char pid[16];
+        snprintf(pid, sizeof(pid), "%d", (int)getpid());
+        setenv("MFTRACE_ROOT_PID", pid, 1);   // inherited across exec by descendants
+        snprintf(log_path, sizeof(log_path), "%s", trace_path());
+        tmp = fopen(log_path, "w");           // always truncate + new header
+    } else {
+        int fd = create_process_trace();
+        if (fd >= 0) tmp = fdopen(fd, "w");
+    }
     if (tmp) {
-        fprintf(tmp, "ts_ns,event,ptr,size,tid\n");
-        fflush(tmp);
+        write_trace_header(tmp);
         fclose(tmp);
-        fprintf(stderr, "[mftrace] header written to %s\n", path);
+        fprintf(stderr, "[mftrace] header written to %s\n", log_path);
     } else {
-        fprintf(stderr, "[mftrace] ERROR: cannot create %s\n", path);
+        fprintf(stderr, "[mftrace] ERROR: cannot create %s\n", log_path);
     }
+    in_hook = 0;
+}
+
+// CSV rows are fully buffered: one write() per CSV_BUF_SIZE bytes, not per event.
+// The buffer is flushed at exit, fork, _exit() and exec.
+#define CSV_BUF_SIZE (1 << 20)
+static char csv_buf[CSV_BUF_SIZE];
+
+static void open_log(void) {
+    const char *path = log_path;
+
+    if (block_mode && !blk_buf && !block_alloc()) {
+        fprintf(stderr, "[mftrace] ERROR: cannot allocate block buffer\n");
+        return;
+    }
+    log_file = fopen(path, block_mode ? "ab" : "a");
+    if (!log_file) {
+        fprintf(stderr, "[mftrace] ERROR: cannot open %s for append\n", path);
+        return;
+    }
+    if (block_mode) {
+        fseek(log_file, 0, SEEK_END);
+        blk_file_off = (uint64_t)ftell(log_file);
+    } else {
+        setvbuf(log_file, csv_buf, _IOFBF, sizeof(csv_buf));
+    }
+}
+
+/* ---- fork handling: the child gets its own trace file and an empty buffer ---- */
+static void atfork_prepare(void) {
+    in_hook = 1;
+    pthread_mutex_lock(&lock);
+    pthread_mutex_lock(&flush_lock);          // no block write in flight across fork()
+    if (log_file) fflush(log_file);           // nothing of the parent's left in stdio buffers
+}
+
+static void atfork_parent(void) {
+    pthread_mutex_unlock(&flush_lock);
+    pthread_mutex_unlock(&lock);
+    in_hook = 0;
+}
+
+static void atfork_child(void) {
+    cached_tid = 0;                           // fork() copied the forking thread's TLS
+    pthread_mutex_init(&lock, NULL);          // parent's locks were held across fork()
+    pthread_mutex_init(&flush_lock, NULL);
+    owes_write = 0;
+    if (log_file) { fclose(log_file); log_file = NULL; }
+    blk_len = 0; blk_n = 0; pend_n = 0;       // the parent's pending blocks stay with the parent
+    blk_idx_n = 0;
+    preinit_n = 0; dropped = 0;
+
+    if (log_state == LOG_READY || log_state == LOG_PENDING) {
+        format_header();                      // new pid, same clock base
+        int fd = create_process_trace();
+        FILE *f = fd >= 0 ? fdopen(fd, "w") : NULL;
+        if (f) {
+            write_trace_header(f);
+            fclose(f);
+            open_log();
+        }
+        log_state = log_file ? LOG_READY : LOG_FAILED;
+    }
+    in_hook = 0;
 }
 
 /* ---- normal tracer init (opens same file for appending) ---- */
@@ -46,39 +503,193 @@ __attribute__((constructor(102)))
 static void init_logger(void) {
     if (initialized) return;
     initialized = 1;
+    in_hook = 1;
+    resolve_real();
+    pthread_atfork(atfork_prepare, atfork_parent, atfork_child);
+    open_log();
 
-    real_malloc = dlsym(RTLD_NEXT, "malloc");
-    real_free   = dlsym(RTLD_NEXT, "free");
-    real_calloc = dlsym(RTLD_NEXT, "calloc");
-    real_realloc= dlsym(RTLD_NEXT, "realloc");
+    pthread_mutex_lock(&lock);
+    if (log_file) {
+        log_state = LOG_READY;
+        for (unsigned i = 0; i < preinit_n; i++) {
+            struct pending_event *e = &preinit_buf[i];
+            write_event(e->ts, e->event, e->ptr, e->size, e->has_size, e->tid);
+        }
+    } else {
+        log_state = LOG_FAILED;
+        dropped += preinit_n;
+    }
+    preinit_n = 0;
+    pthread_mutex_unlock(&lock);
+    block_write_owed();
+    in_hook = 0;
+}
 
-    const char *path = getenv("MFTRACE_LOG");
-    if (!path) path = "results/mftrace_log.csv";
+/* ---- flush the last block, write the index and report losses at exit ---- */
+__attribute__((destructor))
+static void fini_logger(void) {
+    in_hook = 1;
+    pthread_mutex_lock(&lock);
+    if (log_state == LOG_READY && block_mode) {
+        block_finish();
+        log_state = LOG_CLOSED;               // later events would land after the footer
+    } else if (log_file) {
+        fflush(log_file);                     // rows from later destructors go out with exit()'s stdio flush
+    }
+    if (dropped)
+        fprintf(stderr, "[mftrace] WARNING: %lu events could not be recorded\n", dropped);
+    pthread_mutex_unlock(&lock);
+    in_hook = 0;
+}
 
-    log_file = fopen(path, "a");
-    if (!log_file) {
-        fprintf(stderr, "[mftrace] ERROR: cannot open %s for append\n", path);
-        return;
+/* ---- _exit() and exec skip the destructor ----
+ * Forked workers usually leave through _exit() and exec replaces the image, so
+ * fini_logger never runs and an mfz trace would lose its pending block. Exit
+ * paths seal the trace (last block + index); exec only flushes, since the
+ * process keeps tracing if exec fails (readers scan blocks without an index). */
+static void flush_trace(int seal) {
+    if (in_hook) return;                      // called from inside the tracer: lock may be ours
+    in_hook = 1;
+    pthread_mutex_lock(&lock);
+    if (log_state == LOG_READY) {
+        if (block_mode && seal) {
+            block_finish();
+            log_state = LOG_CLOSED;
+        } else {
+            if (block_mode) block_flush();
+            pthread_mutex_lock(&flush_lock);
+            if (log_file) fflush(log_file);
+            pthread_mutex_unlock(&flush_lock);
+        }
     }
-    setvbuf(log_file, NULL, _IOLBF, 0);
+    pthread_mutex_unlock(&lock);
+    in_hook = 0;
+}
+
+static void *real_sym(const char *name) {
+    in_hook = 1;
+    void *p = dlsym(RTLD_NEXT, name);
+    in_hook = 0;
+    return p;
+}
+
+void _exit(int status) {
+    flush_trace(1);
+    void (*real)(int) = (void (*)(int))real_sym("_exit");
+    if (real) real(status);
+    syscall(SYS_exit_group, status);
+    __builtin_unreachable();
+}
+
+void _Exit(int status) {
+    _exit(status);
+}
+
+int execve(const char *path, char *const argv[], char *const envp[]) {
+    flush_trace(0);
+    int (*real)(const char *, char *const[], char *const[]) =
+        (int (*)(const char *, char *const[], char *const[]))real_sym("execve");
+    return real ? real(path, argv, envp) : -1;
+}
+
+int execv(const char *path, char *const argv[]) {
+    flush_trace(0);
+    int (*real)(const char *, char *const[]) =
+        (int (*)(const char *, char *const[]))real_sym("execv");
+    return real ? real(path, argv) : -1;
+}
+
+int execvp(const char *file, char *const argv[]) {
+    flush_trace(0);
+    int (*real)(const char *, char *const[]) =
+        (int (*)(const char *, char *const[]))real_sym("execvp");
+    return real ? real(file, argv) : -1;
+}
+
+int execvpe(const char *file, char *const argv[], char *const envp[]) {
+    flush_trace(0);
+    int (*real)(const char *, char *const[], char *const[]) =
+        (int (*)(const char *, char *const[], char *const[]))real_sym("execvpe");
+    return real ? real(file, argv, envp) : -1;
+}
+
+int fexecve(int fd, char *const argv[], char *const envp[]) {
+    flush_trace(0);
+    int (*real)(int, char *const[], char *const[]) =
+        (int (*)(int, char *const[], char *const[]))real_sym("fexecve");
+    return real ? real(fd, argv, envp) : -1;
+}
+
+// execl* take a NULL-terminated argument list; collect it and use the v variants
+#define COLLECT_ARGS(first, ap, argv)                              \
+    int argc_ = 1;                                                 \
+    va_start(ap, first);                                           \
+    while (va_arg(ap, char *)) argc_++;                            \
+    va_end(ap);                                                    \
+    char *argv[argc_ + 1];                                         \
+    va_start(ap, first);                                           \
+    argv[0] = (char *)first;                                       \
+    for (int i_ = 1; i_ <= argc_; i_++) argv[i_] = va_arg(ap, char *);
+
+int execl(const char *path, const char *arg, ...) {
+    va_list ap;
+    COLLECT_ARGS(arg, ap, argv)
+    va_end(ap);
+    return execv(path, argv);
+}
+
+int execlp(const char *file, const char *arg, ...) {
+    va_list ap;
+    COLLECT_ARGS(arg, ap, argv)
+    va_end(ap);
+    return execvp(file, argv);
+}
+
+int execle(const char *path, const char *arg, ...) {
+    va_list ap;
+    COLLECT_ARGS(arg, ap, argv)
+    char *const *envp = va_arg(ap, char *const *);
+    va_end(ap);
+    return execve(path, argv, envp);
+}
+
+// caller has set in_hook
+static void log_event(const char *event, void *ptr, size_t size, int has_size) {
+    pthread_mutex_lock(&lock);
+    long long ts = get_timestamp();
+    pid_t tid = gettid_wrapper();
+    switch (log_state) {
+    case LOG_READY:
+        write_event(ts, event, ptr, size, has_size, tid);
+        break;
+    case LOG_PENDING:
+        if (preinit_n < PREINIT_EVENTS)
+            preinit_buf[preinit_n++] = (struct pending_event){ ts, event, ptr, size, has_size, tid };
+        else
+            dropped++;
+        break;
+    case LOG_FAILED:
+        dropped++;
+        break;
+    default:                                  // trace already sealed
+        break;
+    }
+    pthread_mutex_unlock(&lock);
+    block_write_owed();                       // compress a full block without holding `lock`
 }
 
 
 
 // malloc hook
 void* malloc(size_t size) {
-    if (!real_malloc) real_malloc = dlsym(RTLD_NEXT, "malloc");
+    if (resolving) return boot_alloc(size);
+    if (!real_malloc) resolve_real();
     if (in_hook) return real_malloc(size);
     in_hook = 1;
 
     void *ptr = real_malloc(size);
 
-    if (log_file) {
-        pthread_mutex_lock(&lock);
-        fprintf(log_file, "%lld,ALLOC,%p,%zu,%d\n",
-                get_time_ns(), ptr, size, gettid_wrapper());
-        pthread_mutex_unlock(&lock);
-    }
+    log_event("ALLOC", ptr, size, 1);
 
     in_hook = 0;
     return ptr;
@@ -86,36 +697,28 @@ void* malloc(size_t size) {
 
 // free hook
 void free(void *ptr) {
-    if (!real_free) real_free = dlsym(RTLD_NEXT, "free");
+    if (is_boot_ptr(ptr)) return;             // bootstrap arena is never reused
+    if (!real_free) resolve_real();
     if (in_hook) { real_free(ptr); return; }
     in_hook = 1;
 
     real_free(ptr);
 
-    if (log_file) {
-        pthread_mutex_lock(&lock);
-        fprintf(log_file, "%lld,FREE,%p,,%d\n",
-                get_time_ns(), ptr, gettid_wrapper());
-        pthread_mutex_unlock(&lock);
-    }
+    log_event("FREE", ptr, 0, 0);
 
     in_hook = 0;
 }
 
 // calloc hook
 void* calloc(size_t nmemb, size_t size) {
-    if (!real_calloc) real_calloc = dlsym(RTLD_NEXT, "calloc");
+    if (resolving) return boot_alloc(nmemb * size);
+    if (!real_calloc) resolve_real();
     if (in_hook) return real_calloc(nmemb, size);
     in_hook = 1;
 
     void *ptr = real_calloc(nmemb, size);
 
-    if (log_file) {
-        pthread_mutex_lock(&lock);
-        fprintf(log_file, "%lld,CALLOC,%p,%zu,%d\n",
-                get_time_ns(), ptr, nmemb * size, gettid_wrapper());
-        pthread_mutex_unlock(&lock);
-    }
+    log_event("CALLOC", ptr, nmemb * size, 1);
 
     in_hook = 0;
     return ptr;
@@ -123,20 +726,21 @@ void* calloc(size_t nmemb, size_t size) {
 
 // realloc hook
 void* realloc(void *ptr, size_t size) {
-    if (!real_realloc) real_realloc = dlsym(RTLD_NEXT, "realloc");
+    if (resolving) return boot_alloc(size);
+    if (!real_realloc) resolve_real();
+    if (is_boot_ptr(ptr)) {                   // move bootstrap memory onto the real heap
+        size_t old = *(size_t *)((char *)ptr - 16);
+        void *moved = malloc(size);
+        if (moved) memcpy(moved, ptr, old < size ? old : size);
+        return moved;
+    }
     if (in_hook) return real_realloc(ptr, size);
     in_hook = 1;
 
     void *new_ptr = real_realloc(ptr, size);
 
-    if (log_file) {
-        pthread_mutex_lock(&lock);
-        fprintf(log_file, "%lld,REALLOC,%p,%zu,%d\n",
-                get_time_ns(), new_ptr, size, gettid_wrapper());
-        pthread_mutex_unlock(&lock);
-    }
+    log_event("REALLOC", new_ptr, size, 1);
 
     in_hook = 0;
     return new_ptr;
 }
-
@@ -3,6 +3,8 @@
 #include <string.h>
 #include <unistd.h>
 #include <time.h>
+#include <math.h>
+#include <pthread.h>
 #include <sys/mman.h>
 #include <fcntl.h>
 #include <errno.h>
@@ -10,40 +12,326 @@
 
 // Enhanced workload generator with deterministic disk-heavy mode and a hook point for malloc_trim.
 // Usage:
-//   ./workload <pattern> <ops> <max_size> [disk] [trim-at-step]
-// pattern: uniform | burst | pareto
-// ops: number of operations
+//   ./workload <pattern> <ops> <max_size> [disk] [trim-at-step] [options]
+// pattern: uniform | burst | pareto | hist (sizes from --size-hist)
+// ops: number of operations (split evenly across threads)
 // max_size: max allocation size in bytes
 // disk: optional "disk" to perform file-backed mmap reads
 // trim-at-step: optional integer; if provided, calls malloc_trim(0) after that many ops
+// options:
+//   --threads N          worker threads (default 1)
+//   --cross-free R       fraction of objects freed by another thread (0..1, default 0)
+//   --lifetime SPEC      random            free a random live slot each op (default)
+//                        fixed:N           every object lives N ops (at least 1)
+//                        exp:MEAN          exponential lifetimes
+//                        bimodal:S:L:P     exponential around S, or around L with probability P
+//   --live N             live objects per thread (default 200000 / threads)
+//   --size-hist FILE     sample sizes from "lo hi count" lines (memfragx analysis --size-hist)
+// Lifetimes are counted in the owning thread's ops and kept on a per-thread timing wheel.
 
-static unsigned long xor_shift() {
-    static unsigned long x = 88172645463325252ULL;
-    x ^= x << 13;
-    x ^= x >> 7;
-    x ^= x << 17;
-    return x;
+#define WHEEL_SIZE (1 << 18)       // longest lifetime, in ops
+#define INBOX_BATCH 64
+
+enum lifetime_kind { LT_RANDOM, LT_FIXED, LT_EXP, LT_BIMODAL };
+
+struct hist_bin { size_t lo, hi; double cum; };
+
+static struct {
+    const char *pattern;
+    long ops;
+    long max_size;
+    int do_disk;
+    long trim_at;
+    int threads;
+    double cross_free;
+    enum lifetime_kind lifetime;
+    double lt_short, lt_long, lt_p_long;
+    long live;
+    struct hist_bin *hist;
+    int hist_n;
+} cfg;
+
+struct node { void *p; struct node *next; };
+
+struct worker {
+    pthread_t th;
+    int id;
+    unsigned long rng;
+    long ops;
+    // random-slot mode
+    void **slots;
+    // timing-wheel mode
+    struct node **wheel;
+    struct node *pool;             // free nodes
+    struct node *nodes;            // initial node block, freed at exit
+    struct node **grown;           // nodes added by take_node, freed at exit
+    long n_grown;
+    long tick;
+    long in_wheel;
+    // objects handed over by other threads, freed here
+    pthread_mutex_t inbox_lock;
+    struct node *inbox;
+    long handed_off, received;
+};
+
+static struct worker *workers;
+static pthread_barrier_t done_line;
+static int tmpfd = -1;
+static size_t tmp_size = 64 * 1024 * 1024; // 64MB
+
+static unsigned long xor_shift(unsigned long *x) {
+    *x ^= *x << 13;
+    *x ^= *x >> 7;
+    *x ^= *x << 17;
+    return *x;
+}
+
+static double uniform01(struct worker *w) {
+    return (xor_shift(&w->rng) >> 11) * (1.0 / 9007199254740992.0);
+}
+
+static size_t hist_size(struct worker *w) {
+    double u = uniform01(w) * cfg.hist[cfg.hist_n - 1].cum;
+    int lo = 0, hi = cfg.hist_n - 1;
+    while (lo < hi) {
+        int mid = (lo + hi) / 2;
+        if (cfg.hist[mid].cum < u) lo = mid + 1; else hi = mid;
+    }
+    const struct hist_bin *b = &cfg.hist[lo];
+    size_t size = b->lo + xor_shift(&w->rng) % (b->hi - b->lo + 1);
+    return size ? size : 1;
+}
+
+static size_t next_size(struct worker *w) {
+    long max_size = cfg.max_size;
+    if (cfg.hist) return hist_size(w);
+    if (strcmp(cfg.pattern, "burst") == 0) {
+        if ((xor_shift(&w->rng) % 100) < 10) return 1 + (xor_shift(&w->rng) % max_size);
+        return 1 + (xor_shift(&w->rng) % (max_size/10 + 1));
+    }
+    if (strcmp(cfg.pattern, "pareto") == 0) {
+        int r = xor_shift(&w->rng) % 1000;
+        if (r < 5) return 1 + (xor_shift(&w->rng) % max_size);
+        return 1 + (xor_shift(&w->rng) % (max_size/20 + 1));
+    }
+    return 1 + (xor_shift(&w->rng) % max_size);
+}
+
+static long next_lifetime(struct worker *w) {
+    double mean = cfg.lt_short;
+    if (cfg.lifetime == LT_FIXED) return (long)mean;
+    if (cfg.lifetime == LT_BIMODAL && uniform01(w) < cfg.lt_p_long) mean = cfg.lt_long;
+    return 1 + (long)(-mean * log(1.0 - uniform01(w)));
+}
+
+// Free locally, or hand the object to another thread (producer/consumer free).
+static void release(struct worker *w, struct node *n) {
+    if (cfg.threads > 1 && cfg.cross_free > 0 && uniform01(w) < cfg.cross_free) {
+        struct worker *to = &workers[(w->id + 1 + xor_shift(&w->rng) % (cfg.threads - 1)) % cfg.threads];
+        pthread_mutex_lock(&to->inbox_lock);
+        n->next = to->inbox;
+        to->inbox = n;
+        pthread_mutex_unlock(&to->inbox_lock);
+        w->handed_off++;
+        return;
+    }
+    free(n->p);
+    n->next = w->pool;
+    w->pool = n;
+}
+
+static void drain_inbox(struct worker *w) {
+    pthread_mutex_lock(&w->inbox_lock);
+    struct node *n = w->inbox;
+    w->inbox = NULL;
+    pthread_mutex_unlock(&w->inbox_lock);
+    while (n) {
+        struct node *next = n->next;
+        free(n->p);
+        n->next = w->pool;         // node now belongs to this thread's pool
+        w->pool = n;
+        w->received++;
+        n = next;
+    }
+}
+
+static void expire_bucket(struct worker *w, long slot) {
+    struct node *n = w->wheel[slot];
+    w->wheel[slot] = NULL;
+    while (n) {
+        struct node *next = n->next;
+        release(w, n);
+        w->in_wheel--;
+        n = next;
+    }
+}
+
+static struct node *take_node(struct worker *w) {
+    if (!w->pool) drain_inbox(w);
+    for (long k = 1; !w->pool && w->in_wheel > 0 && k < WHEEL_SIZE; k++) {
+        long slot = (w->tick + k) % WHEEL_SIZE;   // at capacity: expire the next-due objects early
+        if (w->wheel[slot]) expire_bucket(w, slot);
+    }
+    struct node *n = w->pool;
+    if (n) {
+        w->pool = n->next;
+        return n;
+    }
+    // every node is parked in other threads' inboxes: grow this pool by one
+    n = calloc(1, sizeof(*n));
+    struct node **grown = realloc(w->grown, (w->n_grown + 1) * sizeof(*grown));
+    if (!n || !grown) { perror("calloc"); exit(1); }
+    w->grown = grown;
+    w->grown[w->n_grown++] = n;
+    return n;
+}
+
+static void disk_touch(struct worker *w) {
+    size_t offset = (xor_shift(&w->rng) % (tmp_size - 4096));
+    void *m = mmap(NULL, 4096, PROT_READ, MAP_SHARED, tmpfd, offset);
+    if (m != MAP_FAILED) {
+        volatile char c = ((char*)m)[0];
+        (void)c;
+        munmap(m, 4096);
+    }
+}
+
+static void *run_worker(void *arg) {
+    struct worker *w = arg;
+    long nslots = cfg.live;
+
+    for (long i = 0; i < w->ops; ++i) {
+        if (cfg.lifetime == LT_RANDOM) {
+            long idx = xor_shift(&w->rng) % nslots;
+            if (w->slots[idx]) {
+                struct node *n = take_node(w);
+                n->p = w->slots[idx];
+                release(w, n);
+                w->slots[idx] = NULL;
+            }
+            w->slots[idx] = malloc(next_size(w));
+            if (!w->slots[idx]) { perror("malloc"); exit(1); }
+        } else {
+            w->tick++;
+            expire_bucket(w, w->tick % WHEEL_SIZE);
+            struct node *n = take_node(w);
+            n->p = malloc(next_size(w));
+            if (!n->p) { perror("malloc"); exit(1); }
+            long life = next_lifetime(w);
+            if (life < 1) life = 1;   // the current slot was just expired
+            if (life >= WHEEL_SIZE) life = WHEEL_SIZE - 1;
+            long slot = (w->tick + life) % WHEEL_SIZE;
+            n->next = w->wheel[slot];
+            w->wheel[slot] = n;
+            w->in_wheel++;
+        }
+        if (cfg.threads > 1 && (i % INBOX_BATCH) == 0) drain_inbox(w);
+
+        // Disk activity: mmap and touch a chunk every 500 ops
+        if (w->id == 0 && cfg.do_disk && (i % 500) == 0) disk_touch(w);
+
+        // optional trim point for Approach A demo
+        if (w->id == 0 && cfg.trim_at > 0 && i == cfg.trim_at) {
+            malloc_trim(0); // return top-of-heap to OS
+        }
+
+        if ((i % 10000) == 0) usleep(1000);
+    }
+
+    // Everything still live: owned objects first, then whatever other threads hand over
+    if (cfg.lifetime == LT_RANDOM) {
+        for (long i = 0; i < nslots; i++) {
+            if (!w->slots[i]) continue;
+            struct node *n = take_node(w);
+            n->p = w->slots[i];
+            release(w, n);
+        }
+    } else {
+        for (long s = 0; s < WHEEL_SIZE && w->in_wheel > 0; s++)
+            if (w->wheel[s]) expire_bucket(w, s);
+    }
+    pthread_barrier_wait(&done_line);
+    drain_inbox(w);
+    return NULL;
+}
+
+static int parse_lifetime(const char *spec) {
+    if (strcmp(spec, "random") == 0) { cfg.lifetime = LT_RANDOM; return 0; }
+    if (sscanf(spec, "fixed:%lf", &cfg.lt_short) == 1) { cfg.lifetime = LT_FIXED; return 0; }
+    if (sscanf(spec, "exp:%lf", &cfg.lt_short) == 1) { cfg.lifetime = LT_EXP; return 0; }
+    if (sscanf(spec, "bimodal:%lf:%lf:%lf", &cfg.lt_short, &cfg.lt_long, &cfg.lt_p_long) == 3) {
+        cfg.lifetime = LT_BIMODAL;
+        return 0;
+    }
+    return -1;
+}
+
+static int load_size_hist(const char *path) {
+    FILE *f = fopen(path, "r");
+    if (!f) { perror(path); return -1; }
+    int cap = 64;
+    cfg.hist = malloc(cap * sizeof(*cfg.hist));
+    double cum = 0;
+    char line[256];
+    while (fgets(line, sizeof(line), f)) {
+        unsigned long lo, hi;
+        double count;
+        if (line[0] == '#' || sscanf(line, "%lu %lu %lf", &lo, &hi, &count) != 3) continue;
+        if (count <= 0 || hi < lo) continue;
+        if (cfg.hist_n == cap) cfg.hist = realloc(cfg.hist, (cap *= 2) * sizeof(*cfg.hist));
+        cum += count;
+        cfg.hist[cfg.hist_n++] = (struct hist_bin){ lo, hi, cum };
+    }
+    fclose(f);
+    if (cfg.hist_n == 0) { fprintf(stderr, "%s: no \"lo hi count\" rows\n", path); return -1; }
+    return 0;
+}
+
+static void usage(const char *prog) {
+    fprintf(stderr, "usage: %s <pattern> <ops> <max_size> [disk] [trim-at-step] "
+                    "[--threads N] [--cross-free R] [--lifetime SPEC] [--live N] [--size-hist FILE]\n", prog);
 }
 
 int main(int argc, char **argv) {
-    if (argc < 4) {
-        fprintf(stderr, "usage: %s <pattern> <ops> <max_size> [disk] [trim-at-step]\n", argv[0]);
+    const char *pos[5];
+    int npos = 0;
+    const char *size_hist = NULL;
+    cfg.threads = 1;
+    cfg.lifetime = LT_RANDOM;
+
+    for (int i = 1; i < argc; i++) {
+        if (strncmp(argv[i], "--", 2) != 0) {
+            if (npos < 5) pos[npos++] = argv[i];
+            continue;
+        }
+        if (i + 1 >= argc) { usage(argv[0]); return 1; }
+        const char *val = argv[++i];
+        if (strcmp(argv[i - 1], "--threads") == 0) cfg.threads = atoi(val);
+        else if (strcmp(argv[i - 1], "--cross-free") == 0) cfg.cross_free = atof(val);
+        else if (strcmp(argv[i - 1], "--live") == 0) cfg.live = atol(val);
+        else if (strcmp(argv[i - 1], "--size-hist") == 0) size_hist = val;
+        else if (strcmp(argv[i - 1], "--lifetime") == 0) {
+            if (parse_lifetime(val) != 0) { fprintf(stderr, "bad --lifetime %s\n", val); return 1; }
+        } else { usage(argv[0]); return 1; }
+    }
+    if (npos < 3 || cfg.threads < 1) {
+        usage(argv[0]);
+        return 1;
+    }
+    cfg.pattern = pos[0];
+    cfg.ops = atol(pos[1]);
+    cfg.max_size = atol(pos[2]);
+    cfg.do_disk = (npos >= 4 && strcmp(pos[3], "disk") == 0);
+    cfg.trim_at = (npos >= 5) ? atol(pos[4]) : -1;
+    if (cfg.live <= 0) cfg.live = 200000 / cfg.threads;
+    if (size_hist && load_size_hist(size_hist) != 0) return 1;
+    if (strcmp(cfg.pattern, "hist") == 0 && !cfg.hist) {
+        fprintf(stderr, "pattern \"hist\" needs --size-hist FILE\n");
         return 1;
     }
-    const char *pattern = argv[1];
-    long ops = atol(argv[2]);
-    long max_size = atol(argv[3]);
-    int do_disk = (argc >= 5 && strcmp(argv[4], "disk") == 0);
-    long trim_at = (argc >= 6) ? atol(argv[5]) : -1;
-
-    void **slots = calloc(200000, sizeof(void*));
-    int nslots = 200000;
-    if (!slots) { perror("calloc"); return 1; }
 
     // Prepare a temp file for mmap reads when disk mode is enabled
-    int tmpfd = -1;
-    size_t tmp_size = 64 * 1024 * 1024; // 64MB
-    if (do_disk) {
+    if (cfg.do_disk) {
         char tmpname[] = "/tmp/memfragx_tmpXXXXXX";
         tmpfd = mkstemp(tmpname);
         if (tmpfd < 0) { perror("mkstemp"); return 1; }
@@ -58,49 +346,52 @@ int main(int argc, char **argv) {
         }
     }
 
-    for (long i = 0; i < ops; ++i) {
-        int idx = xor_shift() % nslots;
-        if (slots[idx]) {
-            free(slots[idx]);
-            slots[idx] = NULL;
-        }
-        size_t size = 0;
-        if (strcmp(pattern, "uniform") == 0) {
-            size = 1 + (xor_shift() % max_size);
-        } else if (strcmp(pattern, "burst") == 0) {
-            if ((xor_shift() % 100) < 10) size = 1 + (xor_shift() % max_size);
-            else size = 1 + (xor_shift() % (max_size/10 + 1));
-        } else if (strcmp(pattern, "pareto") == 0) {
-            int r = xor_shift() % 1000;
-            if (r < 5) size = 1 + (xor_shift() % max_size);
-            else size = 1 + (xor_shift() % (max_size/20 + 1));
-        } else {
-            size = 1 + (xor_shift() % max_size);
-        }
-        slots[idx] = malloc(size);
-        if (!slots[idx]) { perror("malloc"); return 1; }
-
-        // Disk activity: mmap and touch a chunk every 500 ops
-        if (do_disk && (i % 500) == 0) {
-            size_t offset = (xor_shift() % (tmp_size - 4096));
-            void *m = mmap(NULL, 4096, PROT_READ, MAP_SHARED, tmpfd, offset);
-            if (m != MAP_FAILED) {
-                volatile char c = ((char*)m)[0];
-                (void)c;
-                munmap(m, 4096);
-            }
-        }
-
-        // optional trim point for Approach A demo
-        if (trim_at > 0 && i == trim_at) {
-            malloc_trim(0); // return top-of-heap to OS
+    workers = calloc(cfg.threads, sizeof(*workers));
+    if (!workers) { perror("calloc"); return 1; }
+    pthread_barrier_init(&done_line, NULL, cfg.threads);
+    for (int t = 0; t < cfg.threads; t++) {
+        struct worker *w = &workers[t];
+        w->id = t;
+        w->rng = 88172645463325252ULL + 0x9E3779B97F4A7C15ULL * t;
+        w->ops = cfg.ops / cfg.threads + (t < cfg.ops % cfg.threads);
+        pthread_mutex_init(&w->inbox_lock, NULL);
+        // one node per live object; nodes migrate between threads with cross frees
+        w->nodes = calloc(cfg.live + 1, sizeof(struct node));
+        if (cfg.lifetime == LT_RANDOM) w->slots = calloc(cfg.live, sizeof(void*));
+        else w->wheel = calloc(WHEEL_SIZE, sizeof(struct node *));
+        if (!w->nodes || (!w->slots && !w->wheel)) { perror("calloc"); return 1; }
+        for (long k = 0; k <= cfg.live; k++) {
+            w->nodes[k].next = w->pool;
+            w->pool = &w->nodes[k];
         }
-
-        if ((i % 10000) == 0) usleep(1000);
+    }
+    if (cfg.threads == 1) {
+        run_worker(&workers[0]);
+    } else {
+        for (int t = 0; t < cfg.threads; t++)
+            pthread_create(&workers[t].th, NULL, run_worker, &workers[t]);
+        for (int t = 0; t < cfg.threads; t++)
+            pthread_join(workers[t].th, NULL);
     }
 
-    for (int i=0;i<nslots;i++) if (slots[i]) free(slots[i]);
-    free(slots);
+    long handed = 0;
+    for (int t = 0; t < cfg.threads; t++) handed += workers[t].handed_off;
+    if (cfg.threads > 1)
+        fprintf(stderr, "[workload] %d threads, %ld ops, %ld cross-thread frees\n",
+                cfg.threads, cfg.ops, handed);
+    // all objects are freed by now; nodes may sit in any thread's pool, so free them here
+    for (int t = 0; t < cfg.threads; t++) {
+        struct worker *w = &workers[t];
+        for (long k = 0; k < w->n_grown; k++) free(w->grown[k]);
+        free(w->grown);
+        free(w->nodes);
+        free(w->slots);
+        free(w->wheel);
+        pthread_mutex_destroy(&w->inbox_lock);
+    }
+    pthread_barrier_destroy(&done_line);
+    free(workers);
+    free(cfg.hist);
     if (tmpfd >= 0) close(tmpfd);
     return 0;
 }